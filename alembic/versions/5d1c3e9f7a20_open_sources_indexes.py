@@ -0,0 +1,40 @@
+"""Open sources indexes
+
+Revision ID: 5d1c3e9f7a20
+Revises: a4852e03b810
+Create Date: 2026-10-18 10:02:41.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1c3e9f7a20'
+down_revision = 'a4852e03b810'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('charityproject', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_charityproject_fully_invested_id',
+            ['fully_invested', 'id'], unique=False,
+            sqlite_where=sa.text('fully_invested = 0'),
+            postgresql_where=sa.text('NOT fully_invested'))
+
+    with op.batch_alter_table('donation', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_donation_fully_invested_id',
+            ['fully_invested', 'id'], unique=False,
+            sqlite_where=sa.text('fully_invested = 0'),
+            postgresql_where=sa.text('NOT fully_invested'))
+
+
+def downgrade():
+    with op.batch_alter_table('donation', schema=None) as batch_op:
+        batch_op.drop_index('ix_donation_fully_invested_id')
+
+    with op.batch_alter_table('charityproject', schema=None) as batch_op:
+        batch_op.drop_index('ix_charityproject_fully_invested_id')
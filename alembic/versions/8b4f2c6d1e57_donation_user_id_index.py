@@ -0,0 +1,27 @@
+"""Donation user_id index
+
+Revision ID: 8b4f2c6d1e57
+Revises: 5d1c3e9f7a20
+Create Date: 2026-10-18 11:24:09.512734
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4f2c6d1e57'
+down_revision = '5d1c3e9f7a20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('donation', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_donation_user_id_id', ['user_id', 'id'], unique=False,
+            postgresql_include=['full_amount', 'comment', 'create_date'])
+
+
+def downgrade():
+    with op.batch_alter_table('donation', schema=None) as batch_op:
+        batch_op.drop_index('ix_donation_user_id_id')
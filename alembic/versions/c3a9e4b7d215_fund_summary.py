@@ -0,0 +1,47 @@
+"""Fund summary
+
+Revision ID: c3a9e4b7d215
+Revises: 8b4f2c6d1e57
+Create Date: 2026-10-18 13:05:47.208316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a9e4b7d215'
+down_revision = '8b4f2c6d1e57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'fundsummary',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('project_count', sa.Integer(), nullable=False),
+        sa.Column('project_full_amount', sa.BigInteger(), nullable=False),
+        sa.Column('project_invested_amount', sa.BigInteger(), nullable=False),
+        sa.Column('donation_count', sa.Integer(), nullable=False),
+        sa.Column('donation_full_amount', sa.BigInteger(), nullable=False),
+        sa.Column(
+            'donation_invested_amount', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.execute(
+        'INSERT INTO fundsummary ('
+        'id, project_count, project_full_amount, project_invested_amount, '
+        'donation_count, donation_full_amount, donation_invested_amount) '
+        'SELECT 1, '
+        '(SELECT COUNT(id) FROM charityproject), '
+        '(SELECT COALESCE(SUM(full_amount), 0) FROM charityproject), '
+        '(SELECT COALESCE(SUM(invested_amount), 0) FROM charityproject), '
+        '(SELECT COUNT(id) FROM donation), '
+        '(SELECT COALESCE(SUM(full_amount), 0) FROM donation), '
+        '(SELECT COALESCE(SUM(invested_amount), 0) FROM donation)'
+    )
+
+
+def downgrade():
+    op.drop_table('fundsummary')
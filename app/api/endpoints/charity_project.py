@@ -1,38 +1,56 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import validators as api_valid
-from app.core.db import get_async_session
+from app.api.pagination import PageParams, page_response
+from app.core.db import get_async_read_session, get_async_session
 from app.core.user import current_superuser
+from app.crud.base import schema_columns
 from app.crud.charity_project import charity_project_crud
-from app.models import Donation
 from app.schemas import charity_project as cp
-from app.services.find_sources import find_sources
-from app.services.invest import invest_money_into_project
+from app.services.allocation import allocate_existing, create_and_allocate
+from app.services.response_cache import (
+    invalidate_if_projects_changed, project_list_cache
+)
 
 router = APIRouter()
 
+PROJECT_LIST_COLUMNS = schema_columns(
+    cp.CharityProjectDB, exclude={'close_date'})
+
 
 @router.get(
     '/',
     response_model=list[cp.CharityProjectDB],
     response_model_exclude={'close_date'})
 async def get_all_charity_projects(
-        session: AsyncSession = Depends(get_async_session)
-) -> list[cp.CharityProjectDB]:
+        request: Request,
+        page: PageParams = Depends(),
+        session: AsyncSession = Depends(get_async_read_session)
+) -> Response:
     """
     Получение списка всех благотворительных проектов.
 
     ### Args:
 
+        page: размер страницы, курсор `after` и фильтры по
+        `fully_invested` и дате создания
+
         session: объект сессии
 
     ### Returns:
 
-        Список проектов
+        Список проектов (одна страница). Курсор следующей страницы
+        передаётся в заголовке `X-Next-Cursor`, ссылка — в `Link`.
+        Если включён кэш ответов, передаётся `ETag`, и на совпавший
+        `If-None-Match` возвращается 304
     """
-    all_projects = await charity_project_crud.get_multi(session)
-    return all_projects
+    cache_key, cached = await project_list_cache.get(request)
+    if cached is not None:
+        return cached
+    all_projects = await page_response(
+        charity_project_crud, page, session, request, PROJECT_LIST_COLUMNS)
+    return await project_list_cache.store(cache_key, request, all_projects)
 
 
 @router.post(
@@ -58,19 +76,11 @@ async def create_new_charity_project(
 
         Новый благотворительный проект
     """
-    await api_valid.check_name_duplicate(charity_project.name, session)
-
-    new_project = await charity_project_crud.create(charity_project, session)
-
-    sources = await find_sources(session, Donation)
-    if sources:
-        changed_sources = invest_money_into_project(
-            target=new_project, sources=sources
+    async with api_valid.check_name_duplicate(session):
+        new_project = await create_and_allocate(
+            charity_project_crud, charity_project, session
         )
-
-        if changed_sources:
-            session.add_all(changed_sources)
-
+    await project_list_cache.invalidate()
     return new_project
 
 
@@ -89,7 +99,8 @@ async def partially_update_charity_project(
 
     Закрытый проект нельзя редактировать, так же
     нельзя установить сумму меньше, которая была вложена ранее.
-    Доступно только для SuperUser.
+    Если целевая сумма увеличена, в проект сразу вкладываются
+    открытые пожертвования. Доступно только для SuperUser.
 
     ### Args:
 
@@ -103,22 +114,23 @@ async def partially_update_charity_project(
 
         Обновленный благотворительный проект
     """
-    charity_project = await api_valid.check_charity_project_exists(
-        charity_project_id, session)
-
-    await api_valid.check_charity_project_fully_invested(charity_project)
-
-    if obj_in.name:
-        await api_valid.check_name_duplicate(obj_in.name, session)
-
-    if obj_in.full_amount and charity_project.invested_amount:
-        charity_project = await api_valid.check_new_full_amount(
-            charity_project, obj_in
+    async with api_valid.check_name_duplicate(session):
+        charity_project = await charity_project_crud.update_open(
+            charity_project_id, obj_in, session
         )
-
-    charity_project = await charity_project_crud.update(
-        charity_project, obj_in, session
-    )
+        if charity_project is not None:
+            if obj_in.full_amount is not None:
+                charity_project = await allocate_existing(
+                    charity_project, session
+                )
+            await session.commit()
+    if charity_project is None:
+        charity_project = await api_valid.check_charity_project_exists(
+            charity_project_id, session)
+        await api_valid.check_charity_project_fully_invested(
+            charity_project)
+        await api_valid.check_new_full_amount(charity_project, obj_in)
+    await invalidate_if_projects_changed(session)
     return charity_project
 
 
@@ -147,17 +159,20 @@ async def remove_charity_project(
 
         Удаленный благотворительный проект
     """
-    charity_project = await api_valid.check_charity_project_exists(
-        charity_project_id, session
-    )
-    await api_valid.check_charity_project_invested_no_money(
+    charity_project = await charity_project_crud.remove_open(
         charity_project_id, session
     )
-    await api_valid.check_charity_project_fully_invested(
-        charity_project
-    )
-    charity_project = await charity_project_crud.remove(
-        charity_project, session
-    )
+    if charity_project is None:
+        charity_project = await api_valid.check_charity_project_exists(
+            charity_project_id, session
+        )
+        await api_valid.check_charity_project_invested_no_money(
+            charity_project
+        )
+        await api_valid.check_charity_project_fully_invested(
+            charity_project
+        )
+    await session.commit()
+    await invalidate_if_projects_changed(session)
 
     return charity_project
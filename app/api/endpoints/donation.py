@@ -1,40 +1,100 @@
-from fastapi import APIRouter, Depends
+from http import HTTPStatus
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.db import get_async_session
-from app.core.user import current_user
+from app.api.pagination import PageParams, page_response
+from app.core.config import settings
+from app.core.db import get_async_read_session, get_async_session
+from app.core.user import current_superuser, current_user
+from app.crud.base import schema_columns
 from app.crud.donation import donation_crud
-from app.models import CharityProject, Donation, User
-from app.schemas.donation import DonationCreate, DonationDB, UserDonationRead
-from app.services.find_sources import find_sources
-from app.services.invest import invest_money_into_project
+from app.models import Donation, User
+from app.schemas.donation import (
+    DonationBulkCreate, DonationBulkResult, DonationCreate, DonationDB,
+    UserDonationRead
+)
+from app.services import constants as c
+from app.services.allocation import (
+    create_and_allocate, create_and_allocate_many
+)
+from app.services.export import EXPORT_FORMATS, EXPORTERS
+from app.services.ingest import (
+    IMPORT_FORMATS, DonationBatch, parse_donations
+)
 
 router = APIRouter()
 
+DONATION_LIST_COLUMNS = schema_columns(DonationDB, exclude={'close_date'})
+
+USER_DONATION_COLUMNS = schema_columns(UserDonationRead)
+
 
 @router.get(
     '/',
     response_model=list[DonationDB],
     response_model_exclude={'close_date'})
 async def get_all_donations(
-        session: AsyncSession = Depends(get_async_session)
-) -> list[DonationDB]:
+        request: Request,
+        page: PageParams = Depends(),
+        session: AsyncSession = Depends(get_async_read_session)
+) -> ORJSONResponse:
     """
     Получение списка пожертвований. Только для SuperUser.
 
     ### Args:
 
+        page: размер страницы, курсор `after` и фильтры по
+        `fully_invested` и дате создания
+
         session: объект сессии
 
     ### Returns:
 
-        Список всех существующих пожертвований
+        Список всех существующих пожертвований (одна страница).
+        Курсор следующей страницы передаётся в заголовке
+        `X-Next-Cursor`, ссылка — в `Link`
     """
-    all_donations = await donation_crud.get_multi(session)
+    all_donations = await page_response(
+        donation_crud, page, session, request, DONATION_LIST_COLUMNS)
 
     return all_donations
 
 
+@router.get(
+    '/export',
+    response_class=StreamingResponse,
+    dependencies=[Depends(current_superuser)])
+async def export_donations(
+        format: Literal['ndjson', 'csv'] = 'ndjson',
+        session: AsyncSession = Depends(get_async_read_session)
+) -> StreamingResponse:
+    """
+    Выгрузка всех пожертвований в NDJSON или CSV. Только для SuperUser.
+
+    Строки отдаются по мере чтения из базы, поэтому память сервера
+    не зависит от числа пожертвований.
+
+    ### Args:
+
+        format: формат выгрузки, `ndjson` или `csv`
+
+        session: объект сессии
+
+    ### Returns:
+
+        Поток строк с пожертвованиями в порядке ID
+    """
+    return StreamingResponse(
+        EXPORTERS[format](session, Donation, c.DONATION_EXPORT_COLUMNS),
+        media_type=EXPORT_FORMATS[format],
+        headers={
+            'Content-Disposition':
+                f'attachment; filename="donations.{format}"'})
+
+
 @router.post(
     '/',
     response_model=DonationDB,
@@ -64,47 +124,90 @@ async def create_new_donation(
 
         Только что созданное пожертвование.
     """
-    new_donation = await donation_crud.create(new_donation, session, user)
+    new_donation = await create_and_allocate(
+        donation_crud, new_donation, session, user,
+        background=settings.allocation_background
+    )
+    return new_donation
+
+
+@router.post(
+    '/bulk',
+    response_model=list[DonationBulkResult],
+    response_model_exclude_none=True,
+    dependencies=[Depends(current_superuser)],
+    openapi_extra={'requestBody': {'required': True, 'content': {
+        media_type: {'schema': {
+            'type': 'array', 'items': DonationBulkCreate.schema()}}
+        for media_type in IMPORT_FORMATS.values()}}})
+async def create_donations_bulk(
+        request: Request,
+        session: AsyncSession = Depends(get_async_session)
+) -> ORJSONResponse:
+    """
+    Пакетная загрузка пожертвований (например, от платёжных партнёров).
+    Только для SuperUser.
 
-    sources = await find_sources(session, CharityProject)
+    Тело — JSON-массив или NDJSON (`Content-Type: application/x-ndjson`)
+    с полями `full_amount`, `user_id` и необязательным `comment`;
+    строки без пользователя или с неизвестным пользователем
+    пропускаются. Пожертвования
+    вставляются многострочными запросами, а их средства распределяются
+    одним проходом по открытым проектам в порядке строк, всё в одной
+    транзакции.
 
-    # if sources:
-    #     changed_sources = invest_money_into_project(
-    #         target=new_donation, sources=sources)
-    #     session.add(*changed_sources)
+    ### Args:
 
-    if sources:
-        changed_sources = invest_money_into_project(
-            target=new_donation, sources=sources)
+        request: запрос с телом пакета
 
-        if changed_sources:
-            session.add_all(changed_sources)
+        session: объект сессии
 
-    await session.commit()
-    await session.refresh(new_donation)
+    ### Returns:
 
-    return new_donation
+        Результат по каждой строке: ID, вложенная сумма и статус
+        созданного пожертвования или ошибка, из-за которой строка
+        пропущена
+    """
+    try:
+        records, results = parse_donations(
+            await request.body(), request.headers.get('content-type', ''))
+    except ValueError as error:
+        raise HTTPException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail=str(error))
+    if records:
+        results += await create_and_allocate_many(
+            DonationBatch(records), session)
+        results.sort(key=lambda result: result['line'])
+    return ORJSONResponse(results)
 
 
 @router.get('/my', response_model=list[UserDonationRead])
 async def get_my_donations(
+        request: Request,
+        page: PageParams = Depends(),
         user: User = Depends(current_user),
-        session: AsyncSession = Depends(get_async_session)
-) -> list[UserDonationRead]:
+        session: AsyncSession = Depends(get_async_read_session)
+) -> ORJSONResponse:
     """
     Получает список пожертвований пользователя.
 
     ### Args:
 
+        page: размер страницы, курсор `after` и фильтры по
+        `fully_invested` и дате создания
+
         user: Данные пользователя, который делает запрос
 
         session: объект сессии
 
     ### Returns:
 
-        Список пожертвований пользователя
+        Список пожертвований пользователя (одна страница). Курсор
+        следующей страницы передаётся в заголовке `X-Next-Cursor`,
+        ссылка — в `Link`
     """
-    user_donations = await donation_crud.get_users_objects(
-        user.id, Donation, session)
+    user_donations = await page_response(
+        donation_crud, page, session, request, USER_DONATION_COLUMNS,
+        user_id=user.id)
 
     return user_donations
@@ -0,0 +1,97 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import get_async_session, pool_stats
+from app.core.user import current_superuser, token_cache, user_cache
+from app.services.open_pool import open_pools
+from app.services.response_cache import project_list_cache
+from app.services.summary import rebuild_summary
+
+router = APIRouter()
+
+
+@router.get(
+    '/open_pool',
+    dependencies=[Depends(current_superuser)])
+async def check_open_pool(
+        session: AsyncSession = Depends(get_async_session)
+) -> dict:
+    """
+    Сверка индекса открытых проектов и пожертвований с базой.
+    Только для SuperUser.
+
+    ### Returns:
+
+        Для каждой таблицы: готов ли индекс, его размер, а также
+        недостающие, лишние и расходящиеся по остатку ID
+    """
+    return await open_pools.check(session)
+
+
+@router.post(
+    '/open_pool/rebuild',
+    dependencies=[Depends(current_superuser)])
+async def rebuild_open_pool(
+        session: AsyncSession = Depends(get_async_session)
+) -> dict:
+    """
+    Перестроение индекса открытых проектов и пожертвований по базе.
+    Только для SuperUser.
+
+    ### Returns:
+
+        Результат сверки перестроенного индекса с базой
+    """
+    await open_pools.rebuild(session)
+    return await open_pools.check(session)
+
+
+@router.get(
+    '/caches',
+    dependencies=[Depends(current_superuser)])
+async def get_cache_stats() -> dict:
+    """
+    Размер и счётчики попаданий и промахов кэшей. Только для SuperUser.
+
+    ### Returns:
+
+        Статистика по каждому кэшу
+    """
+    return {
+        'users': user_cache.stats(),
+        'tokens': token_cache.stats(),
+        'project_list': project_list_cache.stats(),
+    }
+
+
+@router.get(
+    '/pool',
+    dependencies=[Depends(current_superuser)])
+async def get_pool_stats() -> dict:
+    """
+    Состояние пула соединений с базой. Только для SuperUser.
+
+    ### Returns:
+
+        Класс и размер пула, число занятых соединений и переполнение,
+        а также число, суммарное и максимальное время ожиданий соединения
+    """
+    return pool_stats()
+
+
+@router.post(
+    '/summary/rebuild',
+    dependencies=[Depends(current_superuser)])
+async def rebuild_fund_summary(
+        session: AsyncSession = Depends(get_async_session)
+) -> dict:
+    """
+    Пересчёт сводки фонда по проектам и пожертвованиям.
+    Только для SuperUser.
+
+    ### Returns:
+
+        Значения сводки до и после пересчёта
+    """
+    before, after = await rebuild_summary(session)
+    return {'before': before, 'after': after}
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import get_async_read_session
+from app.schemas.stats import FundStats
+from app.services.summary import get_stats
+
+router = APIRouter()
+
+
+@router.get(
+    '/',
+    response_model=FundStats)
+async def get_fund_stats(
+        session: AsyncSession = Depends(get_async_read_session)
+) -> dict:
+    """
+    Сводные показатели фонда. Доступно всем.
+
+    ### Returns:
+
+        Число проектов и пожертвований, собранная и вложенная суммы,
+        недостающая открытым проектам сумма и нераспределённый остаток
+        пожертвований
+    """
+    return await get_stats(session)
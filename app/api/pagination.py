@@ -0,0 +1,69 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Query, Request
+from fastapi.responses import ORJSONResponse
+
+from app.core.config import settings
+from app.crud.base import CRUDBase
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+class PageParams:
+    """
+    Параметры страницы списка: размер, курсор и фильтры.
+    """
+
+    def __init__(
+            self,
+            limit: int = Query(
+                settings.page_size, ge=1, le=settings.page_size_max),
+            after: Optional[int] = Query(
+                None, ge=0,
+                description='ID последней записи предыдущей страницы'),
+            fully_invested: Optional[bool] = None,
+            created_from: Optional[datetime] = None,
+            created_to: Optional[datetime] = None
+    ):
+        self.limit = limit
+        self.after = after
+        self.fully_invested = fully_invested
+        self.created_from = created_from
+        self.created_to = created_to
+
+    @property
+    def filters(self) -> dict:
+        return {
+            'after': self.after,
+            'fully_invested': self.fully_invested,
+            'created_from': self.created_from,
+            'created_to': self.created_to,
+        }
+
+
+async def page_response(
+        crud: CRUDBase,
+        params: PageParams,
+        session,
+        request: Request,
+        columns: tuple[str, ...],
+        **filters
+) -> ORJSONResponse:
+    """
+    Страница записей `crud` с колонками `columns`, отобранная по
+    `params` и дополнительным фильтрам `filters` и сериализованная
+    без ORM-объектов и pydantic-схем. Если есть следующая страница,
+    её курсор передаётся в заголовке `X-Next-Cursor`, а ссылка на неё —
+    в заголовке `Link`.
+    """
+    rows, next_after = await crud.get_page(
+        session, params.limit, columns=columns,
+        **params.filters, **filters)
+    headers = {}
+    if next_after is not None:
+        next_url = request.url.include_query_params(after=next_after)
+        headers[NEXT_CURSOR_HEADER] = str(next_after)
+        headers['Link'] = f'<{next_url}>; rel="next"'
+    return ORJSONResponse(
+        [row._asdict() for row in rows], headers=headers)
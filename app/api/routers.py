@@ -1,7 +1,8 @@
 from fastapi import APIRouter
 
 from app.api.endpoints import (
-    charity_project_router, donation_router, user_router
+    charity_project_router, donation_router, maintenance_router, stats_router,
+    user_router
 )
 
 main_router = APIRouter()
@@ -18,4 +19,16 @@ main_router.include_router(
     tags=('Donations', )
 )
 
+main_router.include_router(
+    maintenance_router,
+    prefix='/maintenance',
+    tags=('Maintenance', )
+)
+
+main_router.include_router(
+    stats_router,
+    prefix='/stats',
+    tags=('Stats', )
+)
+
 main_router.include_router(user_router)
@@ -1,7 +1,8 @@
-import datetime
+from contextlib import asynccontextmanager
 from http import HTTPStatus
 
 from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.crud.charity_project import charity_project_crud
@@ -10,14 +11,27 @@ from app.schemas.charity_project import CharityProjectUpdate
 from app.services import constants as c
 
 
-async def check_name_duplicate(
-        project_name: str, session: AsyncSession
-) -> None:
+def is_name_duplicate(error: IntegrityError) -> bool:
     """
-    Проверяется, доступно ли указанное имя проекта для использования.
+    Проверяет, что ошибка вызвана нарушением уникальности имени проекта.
     """
-    if await charity_project_crud.get_object_id_by_name(
-            project_name, CharityProject, session):
+    message = str(error.orig).lower()
+    return 'unique' in message and 'name' in message
+
+
+@asynccontextmanager
+async def check_name_duplicate(session: AsyncSession):
+    """
+    Превращает нарушение уникальности имени проекта при записи в базу
+    в ответ 400. Отдельный запрос на проверку имени не нужен: его
+    выполняет уникальный индекс, в том числе для параллельных запросов.
+    """
+    try:
+        yield
+    except IntegrityError as error:
+        await session.rollback()
+        if not is_name_duplicate(error):
+            raise
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST,
             detail=c.PROJECT_NAME_ALREADY_EXISTS)
@@ -38,11 +52,10 @@ async def check_charity_project_exists(
 
 
 async def check_charity_project_invested_no_money(
-        project_id: int, session: AsyncSession) -> None:
+        charity_project: CharityProject) -> None:
     """
     Выполняет проверку, были ли произведены инвестиции в указанный проект.
     """
-    charity_project = await charity_project_crud.get(project_id, session)
     if charity_project.invested_amount:
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST,
@@ -62,22 +75,13 @@ async def check_charity_project_fully_invested(
 
 async def check_new_full_amount(
         charity_project: CharityProject,
-        obj_in: CharityProjectUpdate) -> CharityProject:
+        obj_in: CharityProjectUpdate) -> None:
     """
     Функция проверяет, что новая сумма пожертвований для проекта не
     меньше уже внесенной суммы.
-
-    Если новая целевая сумма уже достигнута, статус проекта меняется
-    на fully_invested и присваивается close_date.
     """
-
-    if charity_project.invested_amount > obj_in.full_amount:
+    if (obj_in.full_amount is not None and
+            charity_project.invested_amount > obj_in.full_amount):
         raise HTTPException(
             status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
             detail=c.INVALID_FULL_AMOUNT)
-
-    if charity_project.invested_amount == obj_in.full_amount:
-        charity_project.fully_invested = True
-        charity_project.close_date = datetime.datetime.now()
-
-    return charity_project
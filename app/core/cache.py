@@ -0,0 +1,68 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """
+    LRU-кэш на `maxsize` записей, каждая из которых живёт не дольше
+    `ttl` секунд. Считает попадания и промахи.
+
+    Кэш не потокобезопасен: он рассчитан на работу в одном цикле
+    событий, где между чтением и записью нет переключения задач.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        if entry is not None:
+            del self._data[key]
+        self.misses += 1
+        return None
+
+    def set(
+            self, key: Hashable, value: Any, ttl: Optional[float] = None
+    ) -> None:
+        """
+        Сохраняет `value` на `ttl` секунд, но не дольше времени жизни
+        кэша.
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if not self.enabled or ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
@@ -1,3 +1,5 @@
+from typing import Literal, Optional
+
 from pydantic import BaseSettings
 
 
@@ -7,7 +9,36 @@ class Settings(BaseSettings):
     app_title: str = 'QRKot'
     app_description: str = 'API проекта QRKot'
     database_url: str = 'sqlite+aiosqlite:///./qrkot.db'
+    engine_pool_size: Optional[int] = None
+    engine_max_overflow: Optional[int] = None
+    engine_pool_timeout: Optional[float] = None
+    engine_pool_recycle: Optional[int] = None
+    engine_pool_pre_ping: Optional[bool] = None
+    engine_query_cache_size: int = 500
+    engine_statement_cache_size: Optional[int] = None
+    engine_echo_pool: bool = False
+    sqlite_performance_mode: bool = False
+    replica_url: Optional[str] = None
+    replica_staleness_seconds: float = 1.0
+    response_cache_enabled: bool = False
+    response_cache_url: Optional[str] = None
+    response_cache_size: int = 256
+    response_cache_ttl_seconds: float = 60
     secret: str = 'AAA-DEADLINE-SOON-AAA'
+    investment_engine: Literal['stream', 'prefix_sum'] = 'stream'
+    investment_batch_size: int = 100
+    allocation_queue_enabled: bool = True
+    allocation_queue_batch_size: int = 100
+    allocation_window_ms: int = 0
+    allocation_background: bool = False
+    open_pool_index_enabled: bool = False
+    page_size: int = 100
+    page_size_max: int = 1000
+    user_cache_size: int = 1024
+    user_cache_ttl_seconds: float = 60
+    jwt_cache_size: int = 10000
+    password_hash_workers: int = 4
+    bulk_donations_max: int = 100000
 
     class Config:
         env_file = '.env'
@@ -1,8 +1,20 @@
-from sqlalchemy import Column, Integer
+import math
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import Depends, Request
+from sqlalchemy import Column, Integer, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import declarative_base, declared_attr, sessionmaker
+from sqlalchemy.orm import (
+    Session, declarative_base, declared_attr, sessionmaker
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool
+from starlette.datastructures import MutableHeaders
 
 from app.core.config import settings
+from app.services import constants as c
 
 
 class PreBase:
@@ -20,12 +32,225 @@ class PreBase:
 
 Base = declarative_base(cls=PreBase)
 
-engine = create_async_engine(settings.database_url)
+
+class TimedPool:
+    """
+    Примесь к классу пула, которая измеряет время ожидания соединения.
+    """
+    wait_count = 0
+    wait_total = 0.0
+    wait_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            self.wait_count += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+
+def timed_pool_class(pool_class: type[Pool]) -> type[Pool]:
+    return type(f'Timed{pool_class.__name__}', (TimedPool, pool_class), {})
+
+
+def engine_options(database_url: str) -> dict:
+    """
+    Аргументы `create_async_engine`: значения из `Settings`, а где они
+    не заданы — значения по умолчанию для диалекта из `DB_POOL_DEFAULTS`.
+    """
+    url = make_url(database_url)
+    dialect = url.get_backend_name()
+    options = dict(c.DB_POOL_DEFAULTS.get(dialect, {}))
+    pool_class = url.get_dialect().get_pool_class(url)
+    if dialect == 'sqlite' and settings.engine_pool_size is not None:
+        options.update(c.SQLITE_QUEUE_POOL_DEFAULTS)
+        pool_class = AsyncAdaptedQueuePool
+    configured = {
+        'pool_size': settings.engine_pool_size,
+        'max_overflow': settings.engine_max_overflow,
+        'pool_timeout': settings.engine_pool_timeout,
+        'pool_recycle': settings.engine_pool_recycle,
+        'pool_pre_ping': settings.engine_pool_pre_ping,
+    }
+    options.update(
+        (key, value) for key, value in configured.items()
+        if value is not None)
+    if not issubclass(pool_class, AsyncAdaptedQueuePool):
+        for key in ('pool_size', 'max_overflow', 'pool_timeout'):
+            options.pop(key, None)
+    statement_cache_size = settings.engine_statement_cache_size
+    if dialect == 'postgresql' and statement_cache_size is not None:
+        options['connect_args'] = {
+            'prepared_statement_cache_size': statement_cache_size}
+    options.update(
+        poolclass=timed_pool_class(pool_class),
+        query_cache_size=settings.engine_query_cache_size,
+        echo_pool=settings.engine_echo_pool)
+    return options
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    Включает для нового соединения SQLite профиль производительности
+    `SQLITE_PERFORMANCE_PRAGMAS`: журнал WAL, `synchronous=NORMAL`,
+    отображение файла в память и увеличенный кэш страниц.
+    """
+    cursor = dbapi_connection.cursor()
+    for pragma, value in c.SQLITE_PERFORMANCE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {pragma} = {value}')
+    cursor.close()
+
+
+def make_engine(url: str):
+    """Асинхронный движок с настройками из `engine_options`."""
+    new_engine = create_async_engine(url, **engine_options(url))
+    if new_engine.dialect.name == 'sqlite' and (
+            settings.sqlite_performance_mode):
+        event.listen(new_engine.sync_engine, 'connect', set_sqlite_pragmas)
+    return new_engine
+
+
+engine = make_engine(settings.database_url)
 
 AsyncSessionLocal = sessionmaker(
     engine, expire_on_commit=False, class_=AsyncSession)
 
+replica_engine = None
+
+ReplicaSessionLocal = None
+
+if settings.replica_url:
+    replica_engine = make_engine(settings.replica_url)
+    ReplicaSessionLocal = sessionmaker(
+        replica_engine, expire_on_commit=False, class_=AsyncSession)
+
+
+class WriteTracker:
+    """
+    Записи, сделанные при обработке запроса клиента. После записи
+    клиент получает cookie `LAST_WRITE_COOKIE` со временем записи,
+    и пока не прошло `replica_staleness_seconds`, его чтения идут
+    с основной базы, чтобы он видел свои изменения. Чтения остальных
+    клиентов по-прежнему идут с реплики.
+    """
+    WROTE = 'wrote'
+
+    request_writes: ContextVar[Optional[list]] = ContextVar(
+        'request_writes', default=None)
+
+    @classmethod
+    def track(cls) -> list:
+        """Начинает учёт записей текущего запроса."""
+        writes = []
+        cls.request_writes.set(writes)
+        return writes
+
+    @classmethod
+    def mark(cls) -> None:
+        """Отмечает запись в текущем запросе, если он учитывается."""
+        writes = cls.request_writes.get()
+        if writes is not None:
+            writes.append(time.time())
+
+    @staticmethod
+    def recently_written(request: Request) -> bool:
+        try:
+            last_write = float(request.cookies.get(c.LAST_WRITE_COOKIE, ''))
+        except ValueError:
+            return False
+        return time.time() - last_write < settings.replica_staleness_seconds
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI-middleware, которое учитывает записи каждого HTTP-запроса
+    и отдаёт клиенту, сделавшему запись, cookie со временем записи.
+    Без реплики (`replica_url` не задан) запросы проходят без учёта.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or ReplicaSessionLocal is None:
+            await self.app(scope, receive, send)
+            return
+        writes = WriteTracker.track()
+
+        async def send_with_cookie(message):
+            if message['type'] == 'http.response.start' and writes:
+                max_age = math.ceil(settings.replica_staleness_seconds)
+                MutableHeaders(scope=message).append(
+                    'set-cookie',
+                    f'{c.LAST_WRITE_COOKIE}={writes[-1]}; '
+                    f'Max-Age={max_age}; Path=/; HttpOnly; SameSite=lax')
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+@event.listens_for(Session, 'after_flush')
+def mark_flush(session: Session, flush_context) -> None:
+    session.info[WriteTracker.WROTE] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def mark_bulk_write(orm_execute_state) -> None:
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info[WriteTracker.WROTE] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def mark_write(session: Session) -> None:
+    if session.info.pop(WriteTracker.WROTE, False):
+        WriteTracker.mark()
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_write(session: Session) -> None:
+    session.info.pop(WriteTracker.WROTE, None)
+
+
+def pool_stats() -> dict:
+    """
+    Состояние пула соединений `engine`: занятые соединения,
+    переполнение и время ожидания соединения.
+    """
+    pool = engine.sync_engine.pool
+    stats = {
+        'pool_class': type(pool).__name__.removeprefix('Timed'),
+        'status': pool.status(),
+        'wait_count': pool.wait_count,
+        'wait_total_ms': round(pool.wait_total * 1000, 3),
+        'wait_max_ms': round(pool.wait_max * 1000, 3),
+    }
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow())
+    return stats
+
 
 async def get_async_session():
     async with AsyncSessionLocal() as async_session:
         yield async_session
+
+
+async def get_async_read_session(
+        request: Request,
+        session: AsyncSession = Depends(get_async_session)):
+    """
+    Сессия только для чтения. Если задан `replica_url` и клиент
+    не делал записей в последние `replica_staleness_seconds`, сессия
+    открывается на реплике, иначе используется сессия основной базы.
+    """
+    if (ReplicaSessionLocal is None or
+            WriteTracker.recently_written(request)):
+        yield session
+        return
+    async with ReplicaSessionLocal() as replica_session:
+        yield replica_session
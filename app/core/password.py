@@ -0,0 +1,43 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from fastapi_users.password import PasswordHelper
+
+
+class PooledPasswordHelper(PasswordHelper):
+    """
+    `PasswordHelper`, который хэширует и проверяет пароли в пуле
+    из `workers` потоков, не занимая цикл событий.
+
+    bcrypt отпускает GIL на время вычисления хэша, поэтому потоков
+    достаточно; размер пула ограничивает число одновременных хэшей.
+    """
+
+    def __init__(self, workers: int):
+        super().__init__()
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix='password')
+        return self._executor
+
+    async def hash_async(self, password: str) -> str:
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.hash, password)
+
+    async def verify_and_update_async(
+            self, plain_password: str, hashed_password: str
+    ) -> tuple[bool, Optional[str]]:
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.verify_and_update,
+            plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
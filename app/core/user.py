@@ -1,33 +1,126 @@
+import time
 from typing import Optional, Union
 
+import jwt
 from fastapi import Depends, Request
+from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_users import (
     BaseUserManager, FastAPIUsers, IntegerIDMixin,
-    InvalidPasswordException
+    InvalidPasswordException, exceptions
 )
 from fastapi_users.authentication import (
     AuthenticationBackend, BearerTransport, JWTStrategy
 )
+from fastapi_users.jwt import decode_jwt
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from sqlalchemy import inspect
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
+from app.core.cache import TTLCache
 from app.core.config import settings
 from app.core.db import get_async_session
+from app.core.password import PooledPasswordHelper
 from app.models.user import User
 from app.schemas.user import UserCreate
 from app.services import constants as c
 
 
+user_cache = TTLCache(
+    maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl_seconds)
+
+
+class CachedUserDatabase(SQLAlchemyUserDatabase):
+    """
+    `SQLAlchemyUserDatabase`, который отдаёт пользователей по ID
+    из `user_cache`, не обращаясь к базе.
+
+    В кэше лежат значения колонок, а не ORM-объекты: при каждом
+    попадании собирается новый отсоединённый `User`, поэтому объект
+    из кэша не привязан к чужой сессии и его можно обновить через
+    `update`. Изменение и удаление пользователя сбрасывают запись.
+    Изменения из других процессов становятся видны не позже чем
+    через `user_cache_ttl_seconds`.
+    """
+
+    async def get(self, id: int) -> Optional[User]:
+        columns = user_cache.get(id)
+        if columns is not None:
+            user = User(**columns)
+            make_transient_to_detached(user)
+            return user
+        user = await super().get(id)
+        if user is not None:
+            user_cache.set(id, {
+                attr.key: getattr(user, attr.key)
+                for attr in inspect(User).column_attrs})
+        return user
+
+    async def update(self, user: User, update_dict: dict) -> User:
+        user_cache.pop(user.id)
+        user = await super().update(user, update_dict)
+        user_cache.pop(user.id)
+        return user
+
+    async def delete(self, user: User) -> None:
+        user_cache.pop(user.id)
+        await super().delete(user)
+
+
 async def get_user_db(session: AsyncSession = Depends(get_async_session)):
-    yield SQLAlchemyUserDatabase(session, User)
+    yield CachedUserDatabase(session, User)
 
 bearer_transport = BearerTransport(tokenUrl=c.TOKEN_URL)
 
 
+token_cache = TTLCache(
+    maxsize=settings.jwt_cache_size, ttl=c.JWT_LIFETIME_SECONDS)
+
+
+class CachedJWTStrategy(JWTStrategy):
+    """
+    `JWTStrategy`, который помнит ID пользователя для уже проверенных
+    токенов и не проверяет подпись повторно.
+
+    Токен хранится в `token_cache` до истечения его `exp`, поэтому
+    просроченный токен не пройдёт проверку и из кэша. Пользователь
+    по-прежнему загружается через `user_manager`, так что
+    деактивированный пользователь отклоняется как обычно.
+    """
+
+    async def read_token(
+            self, token: Optional[str],
+            user_manager: BaseUserManager[User, int]
+    ) -> Optional[User]:
+        if token is None:
+            return None
+        user_id = token_cache.get(token)
+        if user_id is None:
+            try:
+                data = decode_jwt(
+                    token, self.decode_key, self.token_audience,
+                    algorithms=[self.algorithm])
+            except jwt.PyJWTError:
+                return None
+            user_id = data.get('user_id')
+            if user_id is None:
+                return None
+            expires_in = None
+            if 'exp' in data:
+                expires_in = data['exp'] - time.time()
+            token_cache.set(token, user_id, ttl=expires_in)
+        try:
+            return await user_manager.get(user_manager.parse_id(user_id))
+        except (exceptions.UserNotExists, exceptions.InvalidID):
+            return None
+
+
+jwt_strategy = CachedJWTStrategy(
+    secret=settings.secret, lifetime_seconds=c.JWT_LIFETIME_SECONDS)
+
+
 def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(
-        secret=settings.secret, lifetime_seconds=c.JWT_LIFETIME_SECONDS
-    )
+    return jwt_strategy
 
 
 auth_backend = AuthenticationBackend(
@@ -36,7 +129,62 @@ auth_backend = AuthenticationBackend(
     get_strategy=get_jwt_strategy)
 
 
+password_helper = PooledPasswordHelper(settings.password_hash_workers)
+
+
 class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
+    """
+    Менеджер пользователей. Хэширование и проверка паролей выполняются
+    в пуле `password_helper`: `create`, `authenticate` и `_update`
+    повторяют методы `BaseUserManager`, но ждут хэш асинхронно.
+    """
+    password_helper: PooledPasswordHelper
+
+    async def create(
+            self, user_create: UserCreate, safe: bool = False,
+            request: Optional[Request] = None
+    ) -> User:
+        await self.validate_password(user_create.password, user_create)
+        if await self.user_db.get_by_email(user_create.email) is not None:
+            raise exceptions.UserAlreadyExists()
+        user_dict = (
+            user_create.create_update_dict() if safe
+            else user_create.create_update_dict_superuser())
+        user_dict['hashed_password'] = await self.password_helper.hash_async(
+            user_dict.pop('password'))
+        created_user = await self.user_db.create(user_dict)
+        await self.on_after_register(created_user, request)
+        return created_user
+
+    async def authenticate(
+            self, credentials: OAuth2PasswordRequestForm
+    ) -> Optional[User]:
+        try:
+            user = await self.get_by_email(credentials.username)
+        except exceptions.UserNotExists:
+            # Хэш всё равно считается, чтобы время ответа не выдавало,
+            # существует ли пользователь.
+            await self.password_helper.hash_async(credentials.password)
+            return None
+        verified, updated_password_hash = (
+            await self.password_helper.verify_and_update_async(
+                credentials.password, user.hashed_password))
+        if not verified:
+            return None
+        if updated_password_hash is not None:
+            await self.user_db.update(
+                user, {'hashed_password': updated_password_hash})
+        return user
+
+    async def _update(self, user: User, update_dict: dict) -> User:
+        if 'password' in update_dict:
+            update_dict = dict(update_dict)
+            password = update_dict.pop('password')
+            await self.validate_password(password, user)
+            update_dict['hashed_password'] = (
+                await self.password_helper.hash_async(password))
+        return await super()._update(user, update_dict)
+
     async def validate_password(
             self, password: str, user: Union[UserCreate, User]) -> None:
         if len(password) < 3:
@@ -51,7 +199,7 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
 
 
 async def get_user_manager(user_db=Depends(get_user_db)):
-    yield UserManager(user_db)
+    yield UserManager(user_db, password_helper)
 
 fastapi_users = FastAPIUsers[User, int](
     get_user_manager,
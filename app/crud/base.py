@@ -1,11 +1,22 @@
-from typing import Optional, Union
+from datetime import datetime
+from typing import Optional, Sequence, Union
 
-from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
 
 from app.models import CharityProject, Donation, User
 
+Columns = Union[Sequence[str], type[BaseModel]]
+
+
+def schema_columns(
+        schema: type[BaseModel], exclude: frozenset[str] = frozenset()
+) -> tuple[str, ...]:
+    """Поля схемы `schema` без `exclude` — колонки для выборки."""
+    return tuple(name for name in schema.__fields__ if name not in exclude)
+
 
 class CRUDBase:
     """
@@ -19,53 +30,88 @@ class CRUDBase:
         result = await session.execute(query)
         return result.scalars().first()
 
-    async def get_multi(self, session: AsyncSession):
-        query = select(self.model)
-        results = await session.execute(query)
-        return results.scalars().all()
+    async def get_multi(
+            self, session: AsyncSession,
+            limit: Optional[int] = None,
+            after: Optional[int] = None,
+            fully_invested: Optional[bool] = None,
+            created_from: Optional[datetime] = None,
+            created_to: Optional[datetime] = None,
+            user_id: Optional[int] = None,
+            columns: Optional[Columns] = None
+    ):
+        """
+        Записи модели по возрастанию ID. `after` — курсор: ID последней
+        записи предыдущей страницы; остальные аргументы — фильтры.
+        С `columns` (списком имён или схемой) вместо ORM-объектов
+        возвращаются строки только с этими колонками.
+        """
+        query = self.build_select(self.model, columns).order_by(self.model.id)
+        if after is not None:
+            query = query.where(self.model.id > after)
+        if fully_invested is not None:
+            query = query.where(self.model.fully_invested == fully_invested)
+        if created_from is not None:
+            query = query.where(self.model.create_date >= created_from)
+        if created_to is not None:
+            query = query.where(self.model.create_date <= created_to)
+        if user_id is not None:
+            query = query.where(self.model.user_id == user_id)
+        if limit is not None:
+            query = query.limit(limit)
+        return await self.fetch(query, columns, session)
+
+    async def get_page(
+            self, session: AsyncSession, limit: int, **filters
+    ) -> tuple[list, Optional[int]]:
+        """
+        Страница из `limit` записей `get_multi` и курсор следующей
+        страницы (`None`, если эта страница последняя).
+        """
+        objs = await self.get_multi(session, limit=limit + 1, **filters)
+        if len(objs) <= limit:
+            return objs, None
+        objs = objs[:limit]
+        return objs, objs[-1].id
 
-    async def create(self, obj_in, session: AsyncSession, user: Optional[User] = None):
+    async def create(
+            self, obj_in, session: AsyncSession,
+            user: Optional[User] = None
+    ):
+        """
+        Добавляет запись и выполняет `flush`, чтобы стали известны ID
+        и значения по умолчанию. Фиксация транзакции остаётся
+        за вызывающим кодом.
+        """
         obj_data = obj_in.dict()
         if user is not None:
             obj_data['user_id'] = user.id
         db_obj = self.model(**obj_data)
         session.add(db_obj)
-        await session.commit()
-        await session.refresh(db_obj)
+        await session.flush()
         return db_obj
 
     @staticmethod
-    async def update(existing_obj, obj_in, session: AsyncSession):
-        existing_data = jsonable_encoder(existing_obj)
-        update_data = obj_in.dict(exclude_unset=True)
-
-        for field in existing_data:
-            if field in update_data:
-                setattr(existing_obj, field, update_data[field])
-
-        session.add(existing_obj)
-        await session.commit()
-        await session.refresh(existing_obj)
-        return existing_obj
-
-    @staticmethod
-    async def remove(obj_to_delete, session: AsyncSession):
-        await session.delete(obj_to_delete)
-        await session.commit()
-        return obj_to_delete
-
-    @staticmethod
-    async def get_object_id_by_name(
-            object_name: str, model: Union[Donation, CharityProject], session: AsyncSession
-    ) -> Optional[int]:
-        query = select(model.id).where(model.name == object_name)
-        result = await session.execute(query)
-        return result.scalars().first()
+    def build_select(
+            model: Union[Donation, CharityProject],
+            columns: Optional[Columns] = None
+    ) -> Select:
+        """
+        Запрос ORM-объектов `model` или, если заданы `columns`, только
+        этих колонок. Схема pydantic задаёт колонки своими полями.
+        """
+        if columns is None:
+            return select(model)
+        if isinstance(columns, type) and issubclass(columns, BaseModel):
+            columns = schema_columns(columns)
+        return select(*(getattr(model, name) for name in columns))
 
     @staticmethod
-    async def get_users_objects(
-            user_id: int, model: Union[Donation, CharityProject], session: AsyncSession
-    ):
-        query = select(model).where(model.user_id == user_id)
+    async def fetch(
+            query: Select, columns: Optional[Columns], session: AsyncSession
+    ) -> list:
+        """Результат запроса `select`: строки колонок или ORM-объекты."""
         results = await session.execute(query)
-        return results.scalars().all()
+        if columns is None:
+            return results.scalars().all()
+        return results.all()
@@ -1,4 +1,139 @@
+import datetime
+from typing import Optional
+
+from sqlalchemy import case, delete, false, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from app.crud.base import CRUDBase
 from app.models import CharityProject
+from app.schemas.charity_project import CharityProjectUpdate
+from app.services.invest import lock_allocation
+from app.services.open_pool import open_pools
+from app.services.summary import (
+    SUMMARY_COLUMNS, record_deltas, record_full_amount
+)
+
+PROJECT_COLUMNS = tuple(CharityProject.__table__.columns)
+
+
+class CRUDCharityProject(CRUDBase):
+    """
+    Изменение и удаление проектов одним запросом, в `WHERE` которого
+    стоят условия проверок. Если запрос не затронул ни одной строки,
+    возвращается `None`, и причину выясняют валидаторы. Условия
+    монотонны (закрытый проект не открывается, вложенная сумма не
+    уменьшается), поэтому повторное чтение её не скроет.
+
+    На СУБД с `UPDATE/DELETE ... RETURNING` (PostgreSQL) строка
+    возвращается тем же запросом, на остальных её дочитывает отдельный
+    `SELECT`. Запросы идут мимо ORM, поэтому сводку фонда и индекс
+    открытых проектов они обновляют сами. Фиксация транзакции остаётся
+    за вызывающим кодом.
+
+    Перед изменением берётся блокировка `lock_allocation`, как
+    и в транзакциях распределения: все они блокируют сводку и строки
+    проектов только под ней, поэтому не могут ждать друг друга
+    по кругу.
+    """
+
+    @staticmethod
+    def open_project_guards(project_id: int) -> list:
+        return [
+            CharityProject.id == project_id,
+            CharityProject.fully_invested == false(),
+        ]
+
+    async def update_open(
+            self,
+            project_id: int,
+            obj_in: CharityProjectUpdate,
+            session: AsyncSession
+    ) -> Optional[CharityProject]:
+        """
+        Обновляет открытый проект. Новая целевая сумма не может быть
+        меньше вложенной; если она ей равна, проект закрывается.
+        """
+        update_data = obj_in.dict(exclude_unset=True, exclude_none=True)
+        guards = self.open_project_guards(project_id)
+        full_amount = update_data.get('full_amount')
+        if full_amount is not None:
+            guards.append(CharityProject.invested_amount <= full_amount)
+            closes = CharityProject.invested_amount == full_amount
+            update_data['fully_invested'] = closes
+            update_data['close_date'] = case(
+                (closes, datetime.datetime.now()),
+                else_=CharityProject.close_date)
+        if not update_data:
+            return await self.fetch_project(
+                select(*PROJECT_COLUMNS).where(*guards), session)
+        await lock_allocation(session)
+        if full_amount is not None:
+            await record_full_amount(
+                session, CharityProject, project_id, full_amount)
+        query = (
+            update(CharityProject)
+            .where(*guards)
+            .values(update_data)
+            .execution_options(synchronize_session=False))
+        if session.bind.dialect.full_returning:
+            project = await self.fetch_project(
+                query.returning(*PROJECT_COLUMNS), session)
+        elif (await session.execute(query)).rowcount:
+            project = await self.fetch_project(
+                select(*PROJECT_COLUMNS)
+                .where(CharityProject.id == project_id), session)
+        else:
+            project = None
+        if project is not None:
+            remaining = 0
+            if not project.fully_invested:
+                remaining = project.full_amount - project.invested_amount
+            open_pools.record(
+                session, 'set', CharityProject, project.id, remaining)
+        return project
+
+    async def remove_open(
+            self,
+            project_id: int,
+            session: AsyncSession
+    ) -> Optional[CharityProject]:
+        """Удаляет открытый проект, в который ещё ничего не вложено."""
+        guards = self.open_project_guards(project_id)
+        guards.append(CharityProject.invested_amount == 0)
+        await lock_allocation(session)
+        query = (
+            delete(CharityProject)
+            .where(*guards)
+            .execution_options(synchronize_session=False))
+        if session.bind.dialect.full_returning:
+            project = await self.fetch_project(
+                query.returning(*PROJECT_COLUMNS), session)
+        else:
+            project = await self.fetch_project(
+                select(*PROJECT_COLUMNS).where(*guards), session)
+            if (project is not None and
+                    not (await session.execute(query)).rowcount):
+                project = None
+        if project is not None:
+            count, full, _ = SUMMARY_COLUMNS[CharityProject]
+            await record_deltas(
+                session, {count: -1, full: -project.full_amount})
+            open_pools.record(
+                session, 'discard', CharityProject, project.id)
+        return project
+
+    @staticmethod
+    async def fetch_project(
+            query, session: AsyncSession
+    ) -> Optional[CharityProject]:
+        """
+        Строка проекта из `query` в виде объекта, не привязанного
+        к сессии, или `None`.
+        """
+        row = (await session.execute(query)).first()
+        if row is None:
+            return None
+        return CharityProject(**row._mapping)
+
 
-charity_project_crud = CRUDBase(CharityProject)
+charity_project_crud = CRUDCharityProject(CharityProject)
@@ -2,6 +2,10 @@ from fastapi import FastAPI
 
 from app.api.routers import main_router
 from app.core.config import settings
+from app.core.db import AsyncSessionLocal, ReadYourWritesMiddleware
+from app.core.user import password_helper
+from app.services.allocation import allocate_donations, allocation_queue
+from app.services.open_pool import open_pools
 
 app = FastAPI(
     title=settings.app_title,
@@ -9,6 +13,42 @@ app = FastAPI(
 
 app.include_router(main_router)
 
+app.add_middleware(ReadYourWritesMiddleware)
+
+
+@app.on_event('startup')
+async def start_allocation_queue() -> None:
+    """
+    Запускает фоновое распределение пожертвований, если оно включено,
+    и дораспределяет пожертвования, оставшиеся открытыми после
+    предыдущего запуска.
+    """
+    if not settings.allocation_background:
+        return
+    async with AsyncSessionLocal() as session:
+        await allocate_donations(session)
+        await session.commit()
+    allocation_queue.start()
+
+
+@app.on_event('startup')
+async def load_open_pools() -> None:
+    """Заполняет индекс открытых записей, если он включён."""
+    if not open_pools.enabled:
+        return
+    async with AsyncSessionLocal() as session:
+        await open_pools.rebuild(session)
+
+
+@app.on_event('shutdown')
+async def stop_allocation_queue() -> None:
+    await allocation_queue.stop()
+
+
+@app.on_event('shutdown')
+def stop_password_pool() -> None:
+    password_helper.shutdown()
+
 
 @app.get('/')
 def read_root() -> dict:
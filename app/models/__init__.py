@@ -1,3 +1,4 @@
 from .charity_project import CharityProject  # noqa
 from .donation import Donation  # noqa
-from .user import User  # noqa
\ No newline at end of file
+from .fund_summary import FundSummary  # noqa
+from .user import User  # noqa
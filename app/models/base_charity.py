@@ -1,6 +1,9 @@
 import datetime
 
-from sqlalchemy import Boolean, CheckConstraint, Column, DateTime, Integer
+from sqlalchemy import (
+    Boolean, CheckConstraint, Column, DateTime, Index, Integer, text
+)
+from sqlalchemy.orm import declared_attr
 
 from app.core.db import Base
 from app.services import constants as c
@@ -11,10 +14,25 @@ class BaseCharity(Base):
     Базовая модель благотворительных проектов и пожертвований.
     """
     __abstract__ = True
-    __table_args__ = (
-        CheckConstraint('full_amount > 0'),
-        CheckConstraint('invested_amount <= full_amount')
-    )
+
+    @declared_attr
+    def __table_args__(cls):
+        """
+        Частичный индекс по открытым записям нужен `stream_sources`
+        и движку `prefix_sum`: закрытые проекты и пожертвования в него
+        не попадают.
+        """
+        return (
+            CheckConstraint('full_amount > 0'),
+            CheckConstraint('invested_amount <= full_amount'),
+            Index(
+                f'ix_{cls.__tablename__}_fully_invested_id',
+                'fully_invested', 'id',
+                sqlite_where=text(c.OPEN_SOURCES_SQLITE_WHERE),
+                postgresql_where=text(c.OPEN_SOURCES_POSTGRESQL_WHERE)
+            ),
+        )
+
     full_amount = Column(Integer)
     invested_amount = Column(Integer, default=c.DEFAULT_INVESTED_AMOUNT)
     fully_invested = Column(Boolean, default=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, Integer, Text
+from sqlalchemy import Column, ForeignKey, Index, Integer, Text
 
 from app.models.base_charity import BaseCharity
 
@@ -11,3 +11,8 @@ class Donation(BaseCharity):
         Integer,
         ForeignKey('user.id', name='fk_donation_user_id_user'))
     comment = Column(Text, nullable=True)
+
+
+Index(
+    'ix_donation_user_id_id', Donation.user_id, Donation.id,
+    postgresql_include=['full_amount', 'comment', 'create_date'])
@@ -0,0 +1,17 @@
+from sqlalchemy import BigInteger, Column, Integer
+
+from app.core.db import Base
+
+
+class FundSummary(Base):
+    """
+    Сводка фонда: число записей и суммы по проектам и пожертвованиям.
+    Единственная строка таблицы поддерживается `app.services.summary`
+    в тех же транзакциях, что меняют проекты и пожертвования.
+    """
+    project_count = Column(Integer, nullable=False, default=0)
+    project_full_amount = Column(BigInteger, nullable=False, default=0)
+    project_invested_amount = Column(BigInteger, nullable=False, default=0)
+    donation_count = Column(Integer, nullable=False, default=0)
+    donation_full_amount = Column(BigInteger, nullable=False, default=0)
+    donation_invested_amount = Column(BigInteger, nullable=False, default=0)
@@ -30,6 +30,23 @@ class DonationCreate(DonationBase):
     pass
 
 
+class DonationBulkCreate(DonationCreate):
+    """Схема пожертвования в пакетной загрузке."""
+    user_id: int
+
+
+class DonationBulkResult(BaseModel):
+    """
+    Результат загрузки одной строки пакета: созданное пожертвование
+    или ошибка.
+    """
+    line: int
+    id: Optional[int]
+    invested_amount: Optional[int]
+    fully_invested: Optional[bool]
+    error: Optional[str]
+
+
 class UserDonationRead(DonationBase):
     """Усеченная схема данных возвращаемых из БД."""
     create_date: datetime
@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+
+
+class FundStats(BaseModel):
+    """Схема сводных показателей фонда."""
+    projects: int
+    donations: int
+    total_raised: int
+    total_invested: int
+    open_project_demand: int
+    unallocated_donations: int
@@ -0,0 +1,209 @@
+import itertools
+from typing import Optional, Union
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.config import settings
+from app.core.db import WriteTracker
+from app.crud.base import CRUDBase
+from app.models import CharityProject, Donation, User
+from app.services.allocation_queue import AllocationQueue
+from app.services.find_sources import open_sources_query
+from app.services.ingest import DonationBatch, ingest_donations
+from app.services.invest import (
+    invest_from_stream, invest_many, lock_allocation
+)
+from app.services.prefix_sum import (
+    invest_by_prefix_sum, invest_many_by_prefix_sum
+)
+from app.services.response_cache import invalidate_if_projects_changed
+
+SOURCE_MODELS = {
+    CharityProject: Donation,
+    Donation: CharityProject,
+}
+
+
+ENGINES = {
+    'stream': invest_from_stream,
+    'prefix_sum': invest_by_prefix_sum,
+}
+
+BATCH_ENGINES = {
+    'stream': invest_many,
+    'prefix_sum': invest_many_by_prefix_sum,
+}
+
+
+async def allocate(
+        target: Union[Donation, CharityProject],
+        session: AsyncSession
+) -> None:
+    """
+    Функция вкладывает средства между новым проектом или пожертвованием
+    и открытыми записями противоположной модели движком, выбранным
+    в настройке `investment_engine`. Фиксация транзакции остаётся
+    за вызывающим кодом.
+    """
+    engine = ENGINES[settings.investment_engine]
+    await engine(target, session, SOURCE_MODELS[type(target)])
+
+
+async def allocate_existing(
+        target: Union[Donation, CharityProject],
+        session: AsyncSession
+) -> Union[Donation, CharityProject]:
+    """
+    Функция вкладывает средства в уже сохранённую запись `target`,
+    прочитанную мимо ORM (например, после увеличения целевой суммы
+    проекта). Запись присоединяется к сессии без повторного чтения,
+    поэтому вкладывается только её свободный остаток. После `flush`
+    запись снова отсоединяется, чтобы не устареть при фиксации,
+    которая остаётся за вызывающим кодом.
+    """
+    make_transient_to_detached(target)
+    session.add(target)
+    await allocate(target, session)
+    await session.flush()
+    session.expunge(target)
+    return target
+
+
+async def allocate_donations(
+        session: AsyncSession,
+        ids: Optional[list[int]] = None
+) -> None:
+    """
+    Функция распределяет средства уже созданных пожертвований с ID
+    из `ids` (по умолчанию — всех открытых) по открытым проектам
+    в порядке создания пожертвований пакетным движком из
+    `BATCH_ENGINES`, выбранным в настройке `investment_engine`. Блокировка
+    `lock_allocation` берётся до чтения пожертвований.
+    """
+    await lock_allocation(session)
+    query = (
+        open_sources_query(Donation)
+        .order_by(Donation.id)
+        .with_for_update())
+    if ids is not None:
+        query = query.where(Donation.id.in_(ids))
+    donations = (await session.execute(query)).scalars().all()
+    engine = BATCH_ENGINES[settings.investment_engine]
+    await engine(donations, session, CharityProject)
+
+
+async def run_allocation_batch(
+        session: AsyncSession,
+        items: list
+) -> list[Optional[Union[Donation, CharityProject]]]:
+    """
+    Функция выполняет пачку заявок очереди распределения и фиксирует
+    её одной транзакцией. Заявка — это либо кортеж `(crud, obj_in, user)`
+    на создание проекта или пожертвования с распределением средств,
+    либо ID уже созданного пожертвования, средства которого
+    распределяются в фоне, либо `DonationBatch` пакетной загрузки
+    пожертвований. Идущие подряд ID обрабатываются одним проходом
+    `allocate_donations`, а результатом `DonationBatch` служит список
+    результатов по строкам.
+
+    ID и значения по умолчанию известны после `flush` (на PostgreSQL
+    ID приходит через `INSERT ... RETURNING`), поэтому `refresh` после
+    фиксации не нужен: созданные объекты отсоединяются от сессии до
+    `commit` и не устаревают вместе с ней.
+
+    Блокировка `lock_allocation` берётся первым запросом транзакции,
+    до вставки записей и обновления сводки фонда, чтобы порядок
+    блокировок совпадал с изменением и удалением проектов.
+    """
+    await lock_allocation(session)
+    results = []
+    for kind, group in itertools.groupby(items, key=type):
+        group = list(group)
+        if kind is int:
+            await allocate_donations(session, group)
+            results.extend([None] * len(group))
+            continue
+        if kind is DonationBatch:
+            for batch in group:
+                results.append(await ingest_donations(
+                    session, batch.records,
+                    BATCH_ENGINES[settings.investment_engine]))
+            continue
+        for crud, obj_in, user in group:
+            db_obj = await crud.create(obj_in, session, user)
+            await allocate(db_obj, session)
+            results.append(db_obj)
+    await session.flush()
+    for db_obj in results:
+        if isinstance(db_obj, (CharityProject, Donation)):
+            session.expunge(db_obj)
+    await session.commit()
+    await invalidate_if_projects_changed(session)
+    return results
+
+
+allocation_queue = AllocationQueue(
+    run_allocation_batch,
+    batch_size=settings.allocation_queue_batch_size,
+    window=settings.allocation_window_ms / 1000)
+
+
+async def submit_write(item, session: AsyncSession):
+    """
+    Выполняет заявку через `allocation_queue` и отмечает запись
+    в текущем запросе: очередь фиксирует её в своей сессии.
+    """
+    result = await allocation_queue.submit(item, session.bind)
+    WriteTracker.mark()
+    return result
+
+
+async def create_and_allocate(
+        crud: CRUDBase,
+        obj_in,
+        session: AsyncSession,
+        user: Optional[User] = None,
+        background: bool = False
+) -> Union[Donation, CharityProject]:
+    """
+    Функция создаёт проект или пожертвование и сразу распределяет
+    средства в одной транзакции с единственной фиксацией.
+
+    На SQLite операция проходит через `allocation_queue`: запись в базу
+    ведёт один исполнитель, а накопившиеся заявки фиксируются вместе.
+    На остальных СУБД источники блокируются построчно
+    (`FOR UPDATE SKIP LOCKED`), и транзакция выполняется сразу.
+
+    С `background=True` пожертвование только создаётся, а его средства
+    распределяются фоновой пачкой `allocation_queue`; ответ не ждёт
+    распределения.
+    """
+    if background:
+        db_obj = await crud.create(obj_in, session, user)
+        session.expunge(db_obj)
+        await session.commit()
+        allocation_queue.enqueue(db_obj.id, session.bind)
+        return db_obj
+
+    item = (crud, obj_in, user)
+    if (settings.allocation_queue_enabled and
+            session.bind.dialect.name == 'sqlite'):
+        return await submit_write(item, session)
+    return (await run_allocation_batch(session, [item]))[0]
+
+
+async def create_and_allocate_many(
+        batch: DonationBatch,
+        session: AsyncSession
+) -> list[dict]:
+    """
+    Функция создаёт пожертвования пакетной загрузки и распределяет
+    их средства одной транзакцией (см. `ingest_donations`). На SQLite
+    пакет, как и одиночные операции, выполняется через
+    `allocation_queue`.
+    """
+    if (settings.allocation_queue_enabled and
+            session.bind.dialect.name == 'sqlite'):
+        return await submit_write(batch, session)
+    return (await run_allocation_batch(session, [batch]))[0]
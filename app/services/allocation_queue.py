@@ -0,0 +1,137 @@
+import asyncio
+import contextvars
+import itertools
+import logging
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+
+class AllocationQueue:
+    """
+    Очередь с единственным исполнителем для операций, которые
+    распределяют средства.
+
+    Заявки выполняются строго по одной пачке за раз, поэтому две
+    операции в одном процессе не читают устаревшие остатки друг друга.
+    Пачка собирается в течение `window` секунд после первой заявки или
+    до `batch_size` заявок и выполняется обработчиком `handler` в одной
+    транзакции. Если пачка завершилась ошибкой, заявки повторяются по
+    одной, чтобы ошибка досталась только своему отправителю.
+    """
+
+    def __init__(
+            self,
+            handler: Callable[[AsyncSession, list], Awaitable[list]],
+            batch_size: int,
+            window: float = 0):
+        self.handler = handler
+        self.batch_size = batch_size
+        self.window = window
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Запускает исполнителя в текущем цикле событий."""
+        self._ensure_worker()
+
+    async def submit(self, item, bind):
+        """
+        Ставит заявку `item` в очередь и дожидается её результата.
+        Пачки выполняются в сессиях, привязанных к `bind`.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._put(bind, item, future)
+        return await future
+
+    def enqueue(self, item, bind) -> None:
+        """
+        Ставит заявку `item` в очередь, не дожидаясь выполнения.
+        Ошибка такой заявки только записывается в лог.
+        """
+        self._put(bind, item, None)
+
+    async def join(self) -> None:
+        """Дожидается выполнения всех поставленных заявок."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self) -> None:
+        """Останавливает исполнителя; ждущие заявки отменяются."""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            future = self._queue.get_nowait()[2]
+            if future is not None:
+                future.cancel()
+        self._worker = None
+        self._queue = None
+
+    def _put(self, bind, item, future) -> None:
+        self._ensure_worker()
+        self._queue.put_nowait((bind, item, future))
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if (self._worker is None or self._worker.done() or
+                self._worker.get_loop() is not loop):
+            self._queue = asyncio.Queue()
+            # Исполнитель не должен наследовать контекст запроса,
+            # в котором его запустили.
+            self._worker = contextvars.Context().run(
+                loop.create_task, self._run())
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            try:
+                for bind, requests in itertools.groupby(
+                        batch, key=lambda request: request[0]):
+                    await self._process(bind, list(requests))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.window
+        while len(batch) < self.batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(
+                    await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _process(self, bind, requests: list) -> None:
+        try:
+            async with AsyncSession(bind, expire_on_commit=False) as session:
+                results = await self.handler(
+                    session, [item for _, item, _ in requests])
+        except Exception as error:
+            if len(requests) > 1:
+                for request in requests:
+                    await self._process(bind, [request])
+                return
+            future = requests[0][2]
+            if future is None:
+                logger.exception('Заявка очереди распределения не выполнена')
+            elif not future.done():
+                future.set_exception(error)
+            return
+        for (_, _, future), result in zip(requests, results):
+            if future is not None and not future.done():
+                future.set_result(result)
@@ -1,4 +1,37 @@
 
+# Database
+
+DB_POOL_DEFAULTS = {
+    'sqlite': {},
+    'postgresql': {
+        'pool_size': 10,
+        'max_overflow': 20,
+        'pool_timeout': 30,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+    },
+}
+
+# Для SQLite пул по умолчанию не используется (NullPool); эти значения
+# применяются, только если задан ENGINE_POOL_SIZE.
+SQLITE_QUEUE_POOL_DEFAULTS = {
+    'max_overflow': 0,
+    'pool_timeout': 30,
+}
+
+# Cookie со временем последней записи клиента (read-your-writes).
+LAST_WRITE_COOKIE = 'qrkot_last_write'
+
+SQLITE_PERFORMANCE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,
+}
+
+
 # JWT
 
 JWT_LIFETIME_SECONDS = 3600
@@ -21,6 +54,32 @@ CHARITY_PROJECT_NAME_MAX = 100
 
 CHARITY_PROJECT_MIN = 1
 
+OPEN_SOURCES_SQLITE_WHERE = 'fully_invested = 0'
+
+OPEN_SOURCES_POSTGRESQL_WHERE = 'NOT fully_invested'
+
+
+# Investment
+
+WRITE_BACK_CHUNK = 500
+
+ALLOCATION_LOCK_KEY = 20230616
+
+
+# Export
+
+EXPORT_CHUNK = 1000
+
+DONATION_EXPORT_COLUMNS = (
+    'id', 'full_amount', 'comment', 'user_id', 'invested_amount',
+    'fully_invested', 'create_date', 'close_date',
+)
+
+
+# Import
+
+IMPORT_CHUNK = 1000
+
 
 # Error messages
 
@@ -33,3 +92,13 @@ DELETION_NOT_ALLOWED = 'В проект были внесены средства
 PATCH_NOT_ALLOWED = 'Закрытый проект нельзя редактировать!'
 
 INVALID_FULL_AMOUNT = 'Нельзя установить новую целевую сумму меньше уже внесенной'
+
+BULK_BODY_INVALID = 'Ожидается JSON-массив или NDJSON с пожертвованиями'
+
+BULK_TOO_MANY_ROWS = 'Слишком много пожертвований в одном запросе'
+
+BULK_ROW_INVALID_JSON = 'Строка не является JSON-объектом'
+
+BULK_ROW_USER_NOT_FOUND = 'Пользователь не найден'
+
+SOURCES_CHANGED = 'Источники изменились во время распределения средств'
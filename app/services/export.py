@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Union
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import CharityProject, Donation
+from app.services import constants as c
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def stream_rows(
+        session: AsyncSession,
+        model: Union[Donation, CharityProject],
+        columns: tuple[str, ...]
+) -> AsyncIterator[list]:
+    """
+    Пачки строк `model` с колонками `columns` в порядке ID. Строки
+    читаются из курсора по мере выгрузки, таблица целиком в память
+    не загружается.
+    """
+    result = await session.stream(
+        select(*(getattr(model, column) for column in columns))
+        .order_by(model.id)
+        .execution_options(yield_per=c.EXPORT_CHUNK))
+    async for rows in result.partitions(c.EXPORT_CHUNK):
+        yield rows
+
+
+async def export_ndjson(
+        session: AsyncSession,
+        model: Union[Donation, CharityProject],
+        columns: tuple[str, ...]
+) -> AsyncIterator[str]:
+    """Выгрузка `model` в NDJSON: по одному JSON-объекту на строку."""
+    async for rows in stream_rows(session, model, columns):
+        yield ''.join(
+            json.dumps(
+                dict(zip(columns, map(export_value, row))),
+                ensure_ascii=False) + '\n'
+            for row in rows)
+
+
+async def export_csv(
+        session: AsyncSession,
+        model: Union[Donation, CharityProject],
+        columns: tuple[str, ...]
+) -> AsyncIterator[str]:
+    """Выгрузка `model` в CSV с заголовком из `columns`."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for rows in stream_rows(session, model, columns):
+        writer.writerows(map(export_value, row) for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+EXPORTERS = {
+    'ndjson': export_ndjson,
+    'csv': export_csv,
+}
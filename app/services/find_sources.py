@@ -1,24 +1,59 @@
-from typing import Union
+from typing import Optional, Union
 
-from sqlalchemy import desc, select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import false, select
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
+from sqlalchemy.sql import Select
 
+from app.core.config import settings
 from app.models import Donation, CharityProject
 
 
-async def find_sources(
-        session: AsyncSession,
-        model: Union[Donation, CharityProject]
-) -> list[Union[Donation, CharityProject]]:
+def open_sources_query(
+        model: Union[Donation, CharityProject], *columns) -> Select:
     """
-    Функция выполняет проверку на наличие незакрытых
-    благотворительных проектов или пожертвований и возвращает
-    список этих проектов/пожертвований, отсортированный по
-    их ID в порядке добавления.
+    Запрос незакрытых проектов или пожертвований целиком либо только
+    указанных столбцов `columns`.
+
+    Условие `fully_invested = false` передаётся литералом, чтобы
+    планировщик мог использовать частичный индекс по открытым записям.
     """
-    sources = await session.execute(
-        select(model).where(
-            model.fully_invested == 0).order_by(
-                desc(model.id)))
+    return select(*columns or (model,)).where(
+        model.fully_invested == false())
+
 
-    return sources.scalars().all()
+async def stream_sources(
+        session: AsyncSession,
+        model: Union[Donation, CharityProject],
+        batch_size: int = settings.investment_batch_size,
+        up_to_id: Optional[int] = None,
+        after_id: Optional[int] = None
+) -> AsyncResult:
+    """
+    Открывает поток строк `(id, full_amount, invested_amount)`
+    незакрытых проектов или пожертвований в порядке добавления.
+    Строки читаются с сервера пачками по `batch_size`, поэтому в памяти
+    не держится весь открытый пул и не создаются ORM-объекты.
+
+    Прочитанные строки блокируются до конца транзакции
+    (`FOR UPDATE SKIP LOCKED`), а строки, занятые параллельными
+    транзакциями, пропускаются. SQLite блокировки строк не поддерживает
+    и выводит запрос без них. Видимость строк параллельных транзакций
+    обеспечивает не эта блокировка, а `lock_allocation`, которую
+    вызывающий код берёт до чтения.
+
+    С `up_to_id` читаются только записи с ID не больше него,
+    с `after_id` — только записи с ID больше него.
+
+    Поток нужно закрыть вызовом `close()`, если он прочитан не до конца.
+    """
+    query = open_sources_query(
+        model, model.id, model.full_amount, model.invested_amount)
+    if up_to_id is not None:
+        query = query.where(model.id <= up_to_id)
+    if after_id is not None:
+        query = query.where(model.id > after_id)
+    return await session.stream(
+        query
+        .order_by(model.id)
+        .with_for_update(skip_locked=True)
+        .execution_options(yield_per=batch_size))
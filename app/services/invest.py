@@ -1,35 +1,155 @@
 import datetime
-from typing import Union
+from typing import Iterable, Iterator, Optional, Union
+
+from sqlalchemy import false, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import CharityProject, Donation
+from app.services import constants as c
+from app.services.find_sources import stream_sources
+from app.services.open_pool import open_pools
+from app.services.summary import record_invested
+from app.services.write_back import add_invested_amount, close_sources
+
+
+async def lock_allocation(session: AsyncSession) -> None:
+    """
+    Функция сериализует распределение средств до конца транзакции.
+
+    На PostgreSQL берётся транзакционная advisory-блокировка
+    `ALLOCATION_LOCK_KEY`. Одного `FOR UPDATE SKIP LOCKED` мало:
+    новый проект и параллельное новое пожертвование не видят
+    незафиксированные строки друг друга и остались бы открытыми
+    одновременно. С блокировкой вторая транзакция читает источники
+    только после фиксации первой и видит её запись.
 
+    На SQLite `SELECT` не начинает транзакцию, и изменение или удаление
+    проекта могло бы зафиксироваться между чтением источников и записью
+    распределения. Поэтому сначала выполняется `UPDATE`, не меняющий
+    ни одной строки: он открывает транзакцию и берёт блокировку записи
+    базы, и все чтения после него видят её состояние до фиксации.
+    Запрос строится по таблице, а не по модели, чтобы не сбрасывать
+    кеш ответов по проектам.
+    """
+    dialect = session.bind.dialect.name
+    if dialect == 'postgresql':
+        await session.execute(
+            select(func.pg_advisory_xact_lock(c.ALLOCATION_LOCK_KEY)))
+    elif dialect == 'sqlite':
+        table = CharityProject.__table__
+        await session.execute(
+            update(table).where(false()).values(id=table.c.id))
 
-def invest_money_into_project(
+
+async def invest_from_stream(
         target: Union[Donation, CharityProject],
-        sources: list[Union[Donation, CharityProject]]
+        session: AsyncSession,
+        model: Union[Donation, CharityProject]
 ) -> None:
     """
-    Функция распределяет свободные средства в благотворительные проекты.
+    Функция распределяет средства между `target` и открытыми записями
+    модели `model`, читая их потоком в порядке добавления.
+
+    Чтение прекращается, как только `target` полностью проинвестирован,
+    поэтому время работы не зависит от размера открытого пула.
+    Закрытые записи обновляются пачкой, частично вложенная — отдельным
+    запросом.
     """
-    needs_investing = target.full_amount
-    changed_sources = []
-    while needs_investing and sources:
-        source = sources.pop()
-        surplus = source.full_amount - source.invested_amount
+    await invest_many([target], session, model)
+
 
-        if surplus < needs_investing:
-            changed_sources.append(source_set_fully_invested(source))
-            needs_investing -= surplus
-            target.invested_amount += surplus
+async def invest_many(
+        targets: Iterable[Union[Donation, CharityProject]],
+        session: AsyncSession,
+        model: Union[Donation, CharityProject]
+) -> None:
+    """
+    Функция по порядку распределяет средства между записями `targets`
+    и открытыми записями модели `model` за один проход по потоку
+    источников.
 
-        if surplus > needs_investing:
-            source.invested_amount += needs_investing
-        else:
-            changed_sources.append(source_set_fully_invested(source))
-        needs_investing = 0
+    Перед чтением источников берётся блокировка `lock_allocation`.
+
+    Если включён индекс открытых пулов, сначала читаются только записи
+    до границы, которую он подсказывает. Если их не хватило, второй
+    проход читает записи после границы: их могли добавить другие
+    процессы, изменений которых индекс не видит. Когда по индексу
+    средств хватало, а в базе их оказалось меньше, индекс перед этим
+    сбрасывается как устаревший.
+
+    Изменения `targets` выполняются над самими объектами, сохранить их
+    должен вызывающий код; источники обновляются запросами.
+    """
+    targets = [target for target in targets if not target.fully_invested]
+    if not targets:
+        return
+
+    await lock_allocation(session)
+
+    pending = iter(targets)
+    target = next(pending)
+    bound = await open_pools.bound(session, model, sum(
+        target.full_amount - target.invested_amount for target in targets))
+    after_id = None
+    if bound is not None:
+        up_to_id, covered = bound
+        target = await invest_pass(
+            target, pending, session, model, up_to_id=up_to_id)
+        if target is None:
+            return
+        if covered:
+            open_pools.invalidate(model)
+        after_id = up_to_id
+    await invest_pass(target, pending, session, model, after_id=after_id)
+
+
+async def invest_pass(
+        target: Union[Donation, CharityProject],
+        pending: Iterator[Union[Donation, CharityProject]],
+        session: AsyncSession,
+        model: Union[Donation, CharityProject],
+        up_to_id: Optional[int] = None,
+        after_id: Optional[int] = None
+) -> Optional[Union[Donation, CharityProject]]:
+    """
+    Один проход по потоку открытых записей `model` (с границами ID
+    `up_to_id` и `after_id`, см. `stream_sources`): средства
+    вкладываются в `target`, а затем в следующие записи из `pending`.
+    Возвращает запись, которой средств не хватило, или `None`.
+    """
+    closed_ids = []
+    partial = None
+    invested = 0
+    sources = await stream_sources(
+        session, model, up_to_id=up_to_id, after_id=after_id)
+    try:
+        async for source in sources:
+            surplus = source.full_amount - source.invested_amount
+            taken = 0
+            while target is not None and taken < surplus:
+                amount = min(
+                    surplus - taken,
+                    target.full_amount - target.invested_amount)
+                taken += amount
+                target.invested_amount += amount
+                if target.invested_amount == target.full_amount:
+                    source_set_fully_invested(target)
+                    target = next(pending, None)
+            invested += taken
+            if taken == surplus:
+                closed_ids.append(source.id)
+            else:
+                partial = (source.id, taken)
+            if target is None:
+                break
+    finally:
+        await sources.close()
 
-    changed_sources.append(source_set_fully_invested(target))
-    return changed_sources
+    await close_sources(session, model, closed_ids)
+    if partial:
+        await add_invested_amount(session, model, *partial)
+    await record_invested(session, model, invested)
+    return target
 
 
 def source_set_fully_invested(
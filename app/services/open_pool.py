@@ -0,0 +1,236 @@
+import bisect
+from typing import Optional, Union
+
+from sqlalchemy import event, false, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+
+from app.core.config import settings
+from app.models import CharityProject, Donation
+
+PENDING_CHANGES = 'open_pool_changes'
+
+
+class OpenPool:
+    """
+    Упорядоченный по ID пул открытых записей одной модели вместе
+    со свободными остатками (`full_amount - invested_amount`).
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._ids: list[int] = []
+        self._remaining: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def items(self) -> list[tuple[int, int]]:
+        return [(obj_id, self._remaining[obj_id]) for obj_id in self._ids]
+
+    def load(self, rows) -> None:
+        self._ids = []
+        self._remaining = {}
+        for obj_id, remaining in rows:
+            self.set(obj_id, remaining)
+        self.ready = True
+
+    def invalidate(self) -> None:
+        self.ready = False
+        self._ids = []
+        self._remaining = {}
+
+    def set(self, obj_id: int, remaining: int) -> None:
+        if remaining <= 0:
+            self.discard(obj_id)
+            return
+        if obj_id not in self._remaining:
+            if not self._ids or obj_id > self._ids[-1]:
+                self._ids.append(obj_id)
+            else:
+                bisect.insort(self._ids, obj_id)
+        self._remaining[obj_id] = remaining
+
+    def reduce(self, obj_id: int, amount: int) -> None:
+        if obj_id in self._remaining:
+            self.set(obj_id, self._remaining[obj_id] - amount)
+
+    def discard(self, obj_id: int) -> None:
+        if self._remaining.pop(obj_id, None) is not None:
+            del self._ids[bisect.bisect_left(self._ids, obj_id)]
+
+    def discard_many(self, ids: list[int]) -> None:
+        for obj_id in ids:
+            self.discard(obj_id)
+
+    def discard_up_to(self, obj_id: int) -> None:
+        position = bisect.bisect_right(self._ids, obj_id)
+        for closed_id in self._ids[:position]:
+            del self._remaining[closed_id]
+        del self._ids[:position]
+
+    def bound(self, needs: int) -> tuple[int, bool]:
+        """
+        ID последней записи из тех, остатков которых хватает на `needs`,
+        и признак того, хватает ли их. Если не хватает всего пула,
+        возвращается ID последней записи пула (или 0 для пустого).
+        """
+        last_id = 0
+        for obj_id in self._ids:
+            if needs <= 0:
+                break
+            last_id = obj_id
+            needs -= self._remaining[obj_id]
+        return last_id, needs <= 0
+
+
+class OpenPools:
+    """
+    Индексы открытых проектов и пожертвований в памяти процесса.
+
+    Индекс подсказывает, до какого ID нужно прочитать открытые записи,
+    чтобы распределить сумму, не просматривая всю таблицу. Изменения
+    копятся в сессии и применяются только после фиксации транзакции;
+    при откате индекс сбрасывается и перестраивается при следующем
+    обращении.
+
+    Индекс видит только изменения своего процесса. Если он устарел,
+    движки замечают нехватку средств, сбрасывают индекс и читают
+    таблицу целиком, так что устаревший индекс замедляет, но не
+    искажает распределение.
+    """
+
+    def __init__(self):
+        self.pools = {CharityProject: OpenPool(), Donation: OpenPool()}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.open_pool_index_enabled
+
+    async def bound(
+            self,
+            session: AsyncSession,
+            model: Union[Donation, CharityProject],
+            needs: int
+    ) -> Optional[tuple[int, bool]]:
+        """
+        Результат `OpenPool.bound` для `model` или `None`, если индекс
+        выключен. Сброшенный индекс перед этим перестраивается.
+        """
+        if not self.enabled:
+            return None
+        pool = self.pools[model]
+        if not pool.ready:
+            await self.rebuild(session, model)
+        return pool.bound(needs)
+
+    async def rebuild(
+            self,
+            session: AsyncSession,
+            model: Optional[Union[Donation, CharityProject]] = None
+    ) -> None:
+        """
+        Перестраивает индекс `model` (по умолчанию — оба) по базе.
+
+        Внутри транзакции с записью индекс уже учитывает её изменения,
+        поэтому накопленные изменения отбрасываются, а откат этой
+        транзакции сбросит индекс.
+        """
+        for pool_model in (model,) if model else self.pools:
+            self.pools[pool_model].load(
+                await session.execute(open_pool_query(pool_model)))
+        info = session.sync_session.info
+        if PENDING_CHANGES in info:
+            info[PENDING_CHANGES] = [('rebuilt', model, ())]
+
+    def invalidate(
+            self,
+            model: Optional[Union[Donation, CharityProject]] = None
+    ) -> None:
+        """Сбрасывает индекс `model` (по умолчанию — оба)."""
+        for pool_model in (model,) if model else self.pools:
+            self.pools[pool_model].invalidate()
+
+    def record(
+            self,
+            session: Union[AsyncSession, Session],
+            operation: str,
+            model: Optional[Union[Donation, CharityProject]],
+            *args
+    ) -> None:
+        """
+        Запоминает в сессии изменение индекса, которое применится
+        после фиксации транзакции.
+        """
+        if not self.enabled:
+            return
+        session = getattr(session, 'sync_session', session)
+        session.info.setdefault(PENDING_CHANGES, []).append(
+            (operation, model, args))
+
+    async def check(self, session: AsyncSession) -> dict:
+        """
+        Сравнивает индекс с базой и возвращает расхождения по моделям:
+        лишние и недостающие ID, а также ID с другим остатком.
+        """
+        report = {}
+        for model, pool in self.pools.items():
+            actual = dict((await session.execute(
+                open_pool_query(model))).all())
+            indexed = dict(pool.items())
+            report[model.__tablename__] = {
+                'ready': pool.ready,
+                'size': len(pool),
+                'missing': sorted(actual.keys() - indexed.keys()),
+                'unexpected': sorted(indexed.keys() - actual.keys()),
+                'mismatched': sorted(
+                    obj_id for obj_id in actual.keys() & indexed.keys()
+                    if actual[obj_id] != indexed[obj_id]),
+            }
+        return report
+
+    def apply(self, changes: list) -> None:
+        for operation, model, args in changes:
+            if operation == 'rebuilt' or not self.pools[model].ready:
+                continue
+            getattr(self.pools[model], operation)(*args)
+
+
+open_pools = OpenPools()
+
+
+def open_pool_query(model: Union[Donation, CharityProject]):
+    return (
+        select(model.id, model.full_amount - model.invested_amount)
+        .where(model.fully_invested == false())
+        .order_by(model.id))
+
+
+@event.listens_for(Session, 'after_commit')
+def apply_open_pool_changes(session: Session) -> None:
+    open_pools.apply(session.info.pop(PENDING_CHANGES, []))
+
+
+@event.listens_for(Session, 'after_rollback')
+def drop_open_pool_changes(session: Session) -> None:
+    if session.info.pop(PENDING_CHANGES, None):
+        open_pools.invalidate()
+
+
+def track_object(mapper, connection, target) -> None:
+    remaining = 0
+    if not target.fully_invested:
+        remaining = target.full_amount - (target.invested_amount or 0)
+    open_pools.record(
+        object_session(target), 'set', type(target), target.id, remaining)
+
+
+def forget_object(mapper, connection, target) -> None:
+    open_pools.record(
+        object_session(target), 'discard', type(target), target.id)
+
+
+for tracked_model in (CharityProject, Donation):
+    event.listen(tracked_model, 'after_insert', track_object)
+    event.listen(tracked_model, 'after_update', track_object)
+    event.listen(tracked_model, 'after_delete', forget_object)
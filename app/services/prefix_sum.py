@@ -0,0 +1,126 @@
+import datetime
+from typing import Iterable, Optional, Union
+
+from sqlalchemy import false, func, select, true, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import CharityProject, Donation
+from app.services.invest import lock_allocation, source_set_fully_invested
+from app.services.open_pool import open_pools
+from app.services.summary import record_invested
+from app.services.write_back import add_invested_amount
+
+
+async def invest_by_prefix_sum(
+        target: Union[Donation, CharityProject],
+        session: AsyncSession,
+        model: Union[Donation, CharityProject]
+) -> None:
+    """
+    Функция распределяет средства между `target` и открытыми записями
+    модели `model` без загрузки этих записей в сессию.
+
+    Нарастающий итог свободных остатков считается оконной функцией.
+    Затронутые записи всегда образуют префикс открытого пула по ID,
+    поэтому достаточно найти последнюю из них: все записи до неё
+    закрываются одним `UPDATE`, а сама она, если заполнена частично,
+    обновляется вторым.
+
+    Окно ограничивается границей индекса открытых пулов, только если
+    по индексу средств хватает. Иначе нужны все открытые записи,
+    включая добавленные другими процессами, которых индекс не видит.
+    Если же средств в границе не хватило, индекс сбрасывается как
+    устаревший и окно считается по всей таблице.
+
+    Закрытие по диапазону ID верно, только пока префикс не меняется
+    параллельными транзакциями, поэтому распределение сериализуется
+    блокировкой `lock_allocation`.
+    """
+    needs_investing = target.full_amount - target.invested_amount
+    if needs_investing <= 0:
+        return
+
+    await lock_allocation(session)
+
+    bound = await open_pools.bound(session, model, needs_investing)
+    up_to_id = bound[0] if bound is not None and bound[1] else None
+    boundary = (await session.execute(
+        boundary_query(model, needs_investing, up_to_id))).first()
+    if up_to_id is not None and (
+            boundary is None or boundary.running_total < needs_investing):
+        open_pools.invalidate(model)
+        boundary = (await session.execute(
+            boundary_query(model, needs_investing))).first()
+    if boundary is None:
+        return
+
+    invested = min(boundary.running_total, needs_investing)
+    boundary_share = invested - (boundary.running_total - boundary.remaining)
+    partial = boundary_share < boundary.remaining
+    closed = model.id < boundary.id if partial else model.id <= boundary.id
+
+    await session.execute(
+        update(model)
+        .where(model.fully_invested == false(), closed)
+        .values(
+            invested_amount=model.full_amount,
+            fully_invested=true(),
+            close_date=datetime.datetime.now())
+        .execution_options(synchronize_session=False))
+    open_pools.record(
+        session, 'discard_up_to', model,
+        boundary.id - 1 if partial else boundary.id)
+
+    if partial:
+        await add_invested_amount(session, model, boundary.id, boundary_share)
+    await record_invested(session, model, invested)
+
+    target.invested_amount += invested
+    if target.invested_amount == target.full_amount:
+        source_set_fully_invested(target)
+
+
+async def invest_many_by_prefix_sum(
+        targets: Iterable[Union[Donation, CharityProject]],
+        session: AsyncSession,
+        model: Union[Donation, CharityProject]
+) -> None:
+    """
+    Функция по порядку распределяет средства между записями `targets`
+    и открытыми записями модели `model`, вызывая `invest_by_prefix_sum`
+    для каждой. Распределение останавливается на первой записи,
+    которой средств не хватило: открытых записей `model` больше нет.
+    """
+    for target in targets:
+        await invest_by_prefix_sum(target, session, model)
+        if not target.fully_invested:
+            return
+
+
+def boundary_query(
+        model: Union[Donation, CharityProject],
+        needs_investing: int,
+        up_to_id: Optional[int] = None):
+    """
+    Запрос последней открытой записи, которая участвует в инвестировании
+    суммы `needs_investing`, вместе с её остатком и нарастающим итогом.
+    С `up_to_id` окно считается только по записям с ID не больше него.
+    """
+    remaining = model.full_amount - model.invested_amount
+    pool = (
+        select(
+            model.id,
+            remaining.label('remaining'),
+            func.sum(remaining).over(order_by=model.id).label(
+                'running_total'))
+        .where(model.fully_invested == false())
+    )
+    if up_to_id is not None:
+        pool = pool.where(model.id <= up_to_id)
+    pool = pool.subquery()
+    return (
+        select(pool)
+        .where(pool.c.running_total - pool.c.remaining < needs_investing)
+        .order_by(pool.c.id.desc())
+        .limit(1)
+    )
@@ -0,0 +1,202 @@
+import hashlib
+from typing import Optional
+
+import orjson
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models import CharityProject
+
+CACHED_HEADERS = ('Link', 'X-Next-Cursor')
+
+PROJECTS_CHANGED = 'charity_projects_changed'
+
+
+class MemoryBackend:
+    """Хранилище кэша ответов в памяти процесса."""
+
+    def __init__(self, maxsize: int):
+        self.values = TTLCache(maxsize=maxsize, ttl=float('inf'))
+        self.counters: dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self.values.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.values.set(key, value, ttl=ttl)
+
+    async def get_counter(self, key: str) -> int:
+        return self.counters.get(key, 0)
+
+    async def incr(self, key: str) -> int:
+        self.counters[key] = self.counters.get(key, 0) + 1
+        self.values.clear()
+        return self.counters[key]
+
+
+class RedisBackend:
+    """
+    Хранилище кэша ответов в Redis или совместимом сервере: кэш
+    и его сбросы общие для всех процессов приложения.
+    """
+
+    def __init__(self, url: str):
+        import redis.asyncio
+
+        self.client = redis.asyncio.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.client.set(key, value, ex=max(1, int(ttl)))
+
+    async def get_counter(self, key: str) -> int:
+        return int(await self.client.get(key) or 0)
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(key)
+
+
+class ResponseCache:
+    """
+    Кэш сериализованных ответов одного endpoint с поддержкой
+    `ETag`/`If-None-Match`.
+
+    Ключ записи включает номер поколения: `invalidate` увеличивает его,
+    и все прежние записи перестают использоваться, а затем истекают
+    по `response_cache_ttl_seconds`.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._backend = None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.response_cache_enabled
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if settings.response_cache_url:
+                self._backend = RedisBackend(settings.response_cache_url)
+            else:
+                self._backend = MemoryBackend(settings.response_cache_size)
+        return self._backend
+
+    async def key(self, request: Request) -> str:
+        generation = await self.backend.get_counter(
+            f'{self.name}:generation')
+        return f'{self.name}:{generation}:{request.url.query}'
+
+    async def get(
+            self, request: Request
+    ) -> tuple[Optional[str], Optional[Response]]:
+        """
+        Ключ записи для `request` и ответ из кэша (`None`, если кэш
+        пуст). Если кэш выключен, возвращается `(None, None)`.
+
+        Ключ вычисляется до чтения данных и передаётся в `store`:
+        если за время чтения кэш сбросили, ответ сохранится в прежнем
+        поколении и не будет выдан после сброса.
+        """
+        if not self.enabled:
+            return None, None
+        key = await self.key(request)
+        cached = await self.backend.get(key)
+        if cached is None:
+            self.misses += 1
+            return key, None
+        self.hits += 1
+        cached = orjson.loads(cached)
+        return key, conditional_response(
+            request, cached['body'].encode(), cached['headers'],
+            cached['etag'])
+
+    async def store(
+            self, key: Optional[str], request: Request, response: Response
+    ) -> Response:
+        """
+        Сохраняет `response` в кэше под ключом `key`, полученным
+        из `get`, и возвращает его с заголовком `ETag` (или ответ 304,
+        если у клиента уже есть эта версия).
+        """
+        if key is None:
+            return response
+        etag = make_etag(response.body)
+        headers = {
+            name: response.headers[name]
+            for name in CACHED_HEADERS if name in response.headers}
+        await self.backend.set(
+            key,
+            orjson.dumps({
+                'body': response.body.decode(),
+                'headers': headers,
+                'etag': etag,
+            }),
+            ttl=settings.response_cache_ttl_seconds)
+        return conditional_response(
+            request, response.body, headers, etag, response.media_type)
+
+    async def invalidate(self) -> None:
+        if self.enabled:
+            await self.backend.incr(f'{self.name}:generation')
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def conditional_response(
+        request: Request, body: bytes, headers: dict, etag: str,
+        media_type: str = 'application/json'
+) -> Response:
+    """Ответ с `ETag`; 304 без тела, если `If-None-Match` совпал."""
+    headers = {**headers, 'ETag': etag}
+    if_none_match = request.headers.get('If-None-Match', '')
+    if etag in (tag.strip() for tag in if_none_match.split(',')):
+        return Response(status_code=304, headers=headers)
+    return Response(body, headers=headers, media_type=media_type)
+
+
+project_list_cache = ResponseCache('charity_project_list')
+
+
+async def invalidate_if_projects_changed(session: AsyncSession) -> None:
+    """
+    Сбрасывает кэш списка проектов, если в зафиксированной транзакции
+    `session` изменялись проекты.
+    """
+    if session.sync_session.info.pop(PROJECTS_CHANGED, False):
+        await project_list_cache.invalidate()
+
+
+@event.listens_for(Session, 'after_flush')
+def mark_flushed_projects(session: Session, flush_context) -> None:
+    if any(
+            isinstance(obj, CharityProject)
+            for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info[PROJECTS_CHANGED] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def mark_updated_projects(orm_execute_state) -> None:
+    if ((orm_execute_state.is_update or orm_execute_state.is_delete) and
+            orm_execute_state.bind_mapper is not None and
+            orm_execute_state.bind_mapper.class_ is CharityProject):
+        orm_execute_state.session.info[PROJECTS_CHANGED] = True
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_changed_projects(session: Session) -> None:
+    session.info.pop(PROJECTS_CHANGED, None)
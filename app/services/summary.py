@@ -0,0 +1,224 @@
+"""
+Сводка фонда в таблице `FundSummary`.
+
+Изменения проектов и пожертвований через ORM учитываются после каждого
+`flush`; пачечные `UPDATE` инвестирования сообщают вложенную сумму
+через `record_invested`. Сводка обновляется запросом `UPDATE ... SET
+x = x + :delta` в той же транзакции.
+
+Пересчёт сводки по исходным таблицам:
+
+    python -m app.services.summary
+"""
+import asyncio
+from collections import Counter
+from typing import Union
+
+from sqlalchemy import event, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, attributes
+
+from app.core.db import AsyncSessionLocal
+from app.models import CharityProject, Donation, FundSummary
+
+SUMMARY_ID = 1
+
+SUMMARY_COLUMNS = {
+    CharityProject: (
+        'project_count', 'project_full_amount', 'project_invested_amount'),
+    Donation: (
+        'donation_count', 'donation_full_amount', 'donation_invested_amount'),
+}
+
+
+def base_totals() -> dict:
+    """Подзапросы, считающие значения сводки по исходным таблицам."""
+    totals = {}
+    for model, (count, full, invested) in SUMMARY_COLUMNS.items():
+        totals[count] = select(func.count(model.id)).scalar_subquery()
+        totals[full] = select(
+            func.coalesce(func.sum(model.full_amount), 0)).scalar_subquery()
+        totals[invested] = select(
+            func.coalesce(func.sum(model.invested_amount), 0)
+        ).scalar_subquery()
+    return totals
+
+
+def apply_deltas(connection, deltas: dict, applied: bool = True) -> None:
+    """
+    Прибавляет `deltas` к строке сводки. Если строки ещё нет, она
+    создаётся пересчётом по исходным таблицам. С `applied=True` они уже
+    содержат изменения, иначе изменения ещё впереди, и к пересчёту
+    прибавляются `deltas`.
+    """
+    query = (
+        update(FundSummary)
+        .where(FundSummary.id == SUMMARY_ID)
+        .values({
+            column: getattr(FundSummary, column) + delta
+            for column, delta in deltas.items()}))
+    if connection.execute(query).rowcount:
+        return
+    connection.execute(
+        insert(FundSummary).values(id=SUMMARY_ID, **base_totals()))
+    if not applied:
+        connection.execute(query)
+
+
+def recompute(connection) -> None:
+    """Пересчитывает строку сводки по исходным таблицам."""
+    result = connection.execute(
+        update(FundSummary)
+        .where(FundSummary.id == SUMMARY_ID)
+        .values(base_totals()))
+    if result.rowcount == 0:
+        connection.execute(
+            insert(FundSummary).values(id=SUMMARY_ID, **base_totals()))
+
+
+def attribute_delta(obj, key: str):
+    """
+    Изменение числового атрибута с прошлой загрузки или `None`, если
+    прежнее значение неизвестно.
+    """
+    history = attributes.get_history(obj, key)
+    if not history.added:
+        return 0
+    if not history.deleted:
+        return None
+    return (history.added[0] or 0) - (history.deleted[0] or 0)
+
+
+@event.listens_for(Session, 'after_flush')
+def summarize_flush(session: Session, flush_context) -> None:
+    deltas = Counter()
+    for sign, objs in ((1, session.new), (-1, session.deleted)):
+        for obj in objs:
+            if type(obj) not in SUMMARY_COLUMNS:
+                continue
+            count, full, invested = SUMMARY_COLUMNS[type(obj)]
+            deltas[count] += sign
+            deltas[full] += sign * obj.full_amount
+            deltas[invested] += sign * (obj.invested_amount or 0)
+    for obj in session.dirty:
+        if type(obj) not in SUMMARY_COLUMNS:
+            continue
+        _, full, invested = SUMMARY_COLUMNS[type(obj)]
+        for column, key in ((full, 'full_amount'),
+                            (invested, 'invested_amount')):
+            delta = attribute_delta(obj, key)
+            if delta is None:
+                recompute(session.connection())
+                return
+            deltas[column] += delta
+    deltas = {column: delta for column, delta in deltas.items() if delta}
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+async def record_deltas(
+        session: AsyncSession, deltas: dict, applied: bool = True
+) -> None:
+    """
+    Учитывает в сводке `deltas` изменений, сделанных запросами мимо ORM
+    (см. `apply_deltas`).
+    """
+    await session.run_sync(
+        lambda sync_session: apply_deltas(
+            sync_session.connection(), deltas, applied))
+
+
+async def record_invested(
+        session: AsyncSession,
+        model: Union[Donation, CharityProject],
+        amount: int
+) -> None:
+    """
+    Учитывает в сводке `amount`, вложенный пачечными запросами
+    в записи `model` мимо ORM.
+    """
+    if amount:
+        await record_deltas(session, {SUMMARY_COLUMNS[model][2]: amount})
+
+
+async def record_full_amount(
+        session: AsyncSession,
+        model: Union[Donation, CharityProject],
+        obj_id: int,
+        full_amount: int
+) -> None:
+    """
+    Учитывает в сводке новую целевую сумму `full_amount` записи `obj_id`
+    до того, как её изменит запрос мимо ORM: разница с прежней суммой
+    считается в самом запросе к сводке.
+    """
+    previous = (
+        select(model.full_amount)
+        .where(model.id == obj_id)
+        .scalar_subquery())
+    await record_deltas(
+        session,
+        {SUMMARY_COLUMNS[model][1]:
+            full_amount - func.coalesce(previous, full_amount)},
+        applied=False)
+
+
+async def get_summary(session: AsyncSession) -> dict:
+    """
+    Значения сводки. Если строки ещё нет, они считаются по исходным
+    таблицам без записи в базу.
+    """
+    columns = [
+        column for columns in SUMMARY_COLUMNS.values() for column in columns]
+    row = (await session.execute(
+        select(*(getattr(FundSummary, column) for column in columns))
+        .where(FundSummary.id == SUMMARY_ID)
+    )).first()
+    if row is not None:
+        return dict(row._mapping)
+    return dict((await session.execute(
+        select(*(
+            value.label(column)
+            for column, value in base_totals().items()))
+    )).one()._mapping)
+
+
+async def get_stats(session: AsyncSession) -> dict:
+    """Сводные показатели фонда для `GET /stats`."""
+    summary = await get_summary(session)
+    return {
+        'projects': summary['project_count'],
+        'donations': summary['donation_count'],
+        'total_raised': summary['donation_full_amount'],
+        'total_invested': summary['project_invested_amount'],
+        'open_project_demand': (
+            summary['project_full_amount'] -
+            summary['project_invested_amount']),
+        'unallocated_donations': (
+            summary['donation_full_amount'] -
+            summary['donation_invested_amount']),
+    }
+
+
+async def rebuild_summary(session: AsyncSession) -> tuple[dict, dict]:
+    """
+    Пересчитывает сводку по исходным таблицам и возвращает значения
+    до и после пересчёта.
+    """
+    before = await get_summary(session)
+    await session.run_sync(
+        lambda sync_session: recompute(sync_session.connection()))
+    await session.commit()
+    return before, await get_summary(session)
+
+
+async def main() -> None:
+    async with AsyncSessionLocal() as session:
+        before, after = await rebuild_summary(session)
+    for column, value in after.items():
+        mark = '' if before[column] == value else f' (было {before[column]})'
+        print(f'{column}: {value}{mark}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
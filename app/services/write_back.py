@@ -0,0 +1,66 @@
+import datetime
+from typing import Iterable, Union
+
+from sqlalchemy import false, true, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import CharityProject, Donation
+from app.services import constants as c
+from app.services.open_pool import open_pools
+
+
+async def close_sources(
+        session: AsyncSession,
+        model: Union[Donation, CharityProject],
+        ids: Iterable[int]
+) -> None:
+    """
+    Функция закрывает записи `model` с указанными ID: выставляет
+    `invested_amount = full_amount`, статус 'fully_invested' и общую
+    дату закрытия. ID передаются пачками по `WRITE_BACK_CHUNK`, чтобы
+    не упираться в лимит параметров запроса.
+
+    Обновляются только открытые записи. Если какая-то из них успела
+    закрыться или исчезнуть, выбрасывается `RuntimeError`, и транзакция
+    распределения должна откатиться.
+
+    Объекты этих записей, уже загруженные в сессию, не обновляются.
+    """
+    ids = list(ids)
+    close_date = datetime.datetime.now()
+    closed = 0
+    for start in range(0, len(ids), c.WRITE_BACK_CHUNK):
+        closed += (await session.execute(
+            update(model)
+            .where(
+                model.id.in_(ids[start:start + c.WRITE_BACK_CHUNK]),
+                model.fully_invested == false())
+            .values(
+                invested_amount=model.full_amount,
+                fully_invested=true(),
+                close_date=close_date)
+            .execution_options(synchronize_session=False))).rowcount
+    if closed != len(ids):
+        raise RuntimeError(c.SOURCES_CHANGED)
+    open_pools.record(session, 'discard_many', model, ids)
+
+
+async def add_invested_amount(
+        session: AsyncSession,
+        model: Union[Donation, CharityProject],
+        obj_id: int,
+        amount: int
+) -> None:
+    """
+    Функция увеличивает `invested_amount` открытой записи на `amount`,
+    не закрывая её. Если запись успела закрыться или исчезнуть,
+    выбрасывается `RuntimeError`.
+    """
+    result = await session.execute(
+        update(model)
+        .where(model.id == obj_id, model.fully_invested == false())
+        .values(invested_amount=model.invested_amount + amount)
+        .execution_options(synchronize_session=False))
+    if not result.rowcount:
+        raise RuntimeError(c.SOURCES_CHANGED)
+    open_pools.record(session, 'reduce', model, obj_id, amount)
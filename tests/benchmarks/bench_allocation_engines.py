@@ -0,0 +1,58 @@
+"""
+Сравнение движков распределения средств при создании проекта,
+который покрывает длинную очередь открытых пожертвований.
+
+Запуск из корня проекта:
+
+    python -m tests.benchmarks.bench_allocation_engines --open 50000
+"""
+import argparse
+import time
+
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.models import CharityProject, Donation
+from app.services.allocation import allocate
+from tests.benchmarks import common
+
+DONATION_AMOUNT = 100
+
+
+async def create_project(session_factory, opened: int) -> float:
+    async with session_factory() as session:
+        project = CharityProject(
+            name=f'bench-{time.perf_counter_ns()}', description='bench',
+            full_amount=opened * DONATION_AMOUNT - DONATION_AMOUNT // 2,
+            invested_amount=0, fully_invested=False)
+        session.add(project)
+        await session.flush()
+        started = time.perf_counter()
+        await allocate(project, session)
+        await session.commit()
+        elapsed = time.perf_counter() - started
+        still_open = await session.scalar(
+            select(func.count(Donation.id)).where(~Donation.fully_invested))
+        assert still_open == 1, still_open
+    return elapsed
+
+
+async def main(opened: int) -> None:
+    print(f'open donations={opened}')
+    for engine in ('stream', 'prefix_sum'):
+        db_path = common.temp_database()
+        common.create_schema(db_path)
+        common.seed_sources(
+            db_path, Donation, closed=0, opened=opened,
+            amount=DONATION_AMOUNT)
+        settings.investment_engine = engine
+        elapsed = await create_project(
+            common.async_sessionmaker(db_path), opened)
+        print(f'{engine:>10}: {elapsed * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--open', type=int, default=50_000, dest='opened')
+    args = parser.parse_args()
+    common.run(lambda: main(args.opened))
@@ -0,0 +1,75 @@
+"""
+Накладные расходы аутентификации на запрос: `JWTStrategy.read_token`
+с проверкой подписи каждого токена и `CachedJWTStrategy` с кэшем
+проверенных токенов.
+
+Синтетическая нагрузка — `--requests` запросов от `--clients` клиентов,
+у каждого свой токен. Загрузка пользователя заменена заглушкой, чтобы
+измерялась только работа с токеном. Кроме времени на запрос выводится
+доля одного ядра, которую заняла бы проверка токенов при 10 000
+запросов в секунду.
+
+Запуск из корня проекта:
+
+    python -m tests.benchmarks.bench_auth --requests 100000 --clients 1000
+"""
+import argparse
+import random
+import time
+
+from fastapi_users.authentication import JWTStrategy
+
+from app.core.config import settings
+from app.core.user import CachedJWTStrategy, UserManager, token_cache
+from app.models.user import User
+from app.services import constants as c
+from tests.benchmarks import common
+
+TARGET_RPS = 10_000
+
+
+class StubUserManager(UserManager):
+    """Менеджер пользователей без базы: `get` сразу возвращает `User`."""
+
+    def __init__(self):
+        pass
+
+    async def get(self, id: int) -> User:
+        return User(id=id, is_active=True)
+
+
+async def run_load(strategy, tokens: list[str], requests: int) -> float:
+    user_manager = StubUserManager()
+    started = time.perf_counter()
+    for _ in range(requests):
+        user = await strategy.read_token(
+            random.choice(tokens), user_manager)
+        assert user is not None
+    return time.perf_counter() - started
+
+
+async def main(requests: int, clients: int) -> None:
+    strategy_args = dict(
+        secret=settings.secret, lifetime_seconds=c.JWT_LIFETIME_SECONDS)
+    plain = JWTStrategy(**strategy_args)
+    cached = CachedJWTStrategy(**strategy_args)
+    tokens = [
+        await plain.write_token(User(id=number))
+        for number in range(1, clients + 1)
+    ]
+    token_cache.clear()
+    for name, strategy in (('JWTStrategy', plain), ('cached', cached)):
+        elapsed = await run_load(strategy, tokens, requests)
+        per_request = elapsed / requests * 1_000_000
+        print(
+            f'{name:>12}: {per_request:7.1f} us/request, '
+            f'{per_request * TARGET_RPS / 10_000:5.1f}% '
+            f'of one core at {TARGET_RPS} req/s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=100_000)
+    parser.add_argument('--clients', type=int, default=1_000)
+    args = parser.parse_args()
+    common.run(lambda: main(args.requests, args.clients))
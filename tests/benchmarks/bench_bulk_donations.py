@@ -0,0 +1,120 @@
+"""
+Пакетная загрузка пожертвований `POST /donation/bulk` против такого же
+числа одиночных `POST /donation/` на SQLite.
+
+Одиночные запросы замеряются на меньшей выборке (`--single`),
+и их время пересчитывается на размер пакета. Каждый режим запускается
+в отдельном процессе со своей базой, потому что адрес базы читается
+при импорте `app.core.db`. Запуск из корня проекта:
+
+    python -m tests.benchmarks.bench_bulk_donations --donations 100000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from sqlalchemy import create_engine
+
+from app.models import CharityProject, User
+from tests.benchmarks import common
+
+PROJECT_AMOUNT = 100_000
+
+PARTNER_ID = 1
+
+
+def donation_amount(number: int) -> int:
+    return 100 + number % 900
+
+
+def seed_partner(db_path) -> None:
+    """Создаёт пользователя, от имени которого идут пожертвования."""
+    engine = create_engine(f'sqlite:///{db_path}')
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), {
+            'id': PARTNER_ID, 'email': 'partner@example.com',
+            'hashed_password': 'bench', 'is_active': True,
+            'is_superuser': True, 'is_verified': True,
+        })
+    engine.dispose()
+
+
+async def worker(mode: str, donations: int) -> None:
+    from httpx import AsyncClient
+
+    from app.core.user import current_superuser, current_user
+    from app.main import app
+
+    user = User(
+        id=PARTNER_ID, is_active=True, is_verified=True, is_superuser=True)
+    app.dependency_overrides[current_user] = lambda: user
+    app.dependency_overrides[current_superuser] = lambda: user
+    async with AsyncClient(
+            app=app, base_url='http://test', timeout=None) as client:
+        started = time.perf_counter()
+        if mode == 'bulk':
+            body = '\n'.join(
+                json.dumps({
+                    'full_amount': donation_amount(number),
+                    'user_id': PARTNER_ID,
+                })
+                for number in range(donations))
+            response = await client.post(
+                '/donation/bulk', content=body.encode(),
+                headers={'Content-Type': 'application/x-ndjson'})
+            assert response.status_code == 200, response.text
+            assert all('id' in row for row in response.json())
+        else:
+            for number in range(donations):
+                response = await client.post(
+                    '/donation/',
+                    json={'full_amount': donation_amount(number)})
+                assert response.status_code == 200, response.text
+        elapsed = time.perf_counter() - started
+    print(json.dumps({'seconds': elapsed}))
+
+
+def run_mode(mode: str, donations: int) -> float:
+    db_path = common.temp_database()
+    common.create_schema(db_path)
+    seed_partner(db_path)
+    projects = sum(
+        donation_amount(number) for number in range(donations)
+    ) // PROJECT_AMOUNT
+    common.seed_sources(
+        db_path, CharityProject, closed=0, opened=projects,
+        amount=PROJECT_AMOUNT)
+    env = dict(os.environ, DATABASE_URL=f'sqlite+aiosqlite:///{db_path}')
+    output = subprocess.run(
+        [sys.executable, '-m', 'tests.benchmarks.bench_bulk_donations',
+         '--worker', mode, '--donations', str(donations)],
+        env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])['seconds']
+
+
+def main(donations: int, single: int) -> None:
+    seconds = run_mode('bulk', donations)
+    print(
+        f'  bulk: {donations / seconds:9.1f} donations/s '
+        f'({seconds:.2f} s for {donations})')
+    seconds = run_mode('single', single)
+    print(
+        f'single: {single / seconds:9.1f} donations/s '
+        f'({seconds:.2f} s for {single}, '
+        f'~{seconds * donations / single:.0f} s for {donations})')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--donations', type=int, default=100_000)
+    parser.add_argument('--single', type=int, default=2_000)
+    parser.add_argument('--worker', choices=('bulk', 'single'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        common.run(lambda: worker(args.worker, args.donations))
+    else:
+        main(args.donations, args.single)
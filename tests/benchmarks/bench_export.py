@@ -0,0 +1,89 @@
+"""
+Пиковая память (RSS) при выгрузке всех пожертвований: список ORM-объектов
+и схем `DonationDB`, как в `GET /donation/` без пагинации, и потоковая
+выгрузка `GET /donation/export` в NDJSON и CSV.
+
+Каждый способ запускается в отдельном процессе, чтобы замеры пиковой
+памяти не влияли друг на друга. Запуск из корня проекта:
+
+    python -m tests.benchmarks.bench_export --donations 1000000
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from app.crud.donation import donation_crud
+from app.models import Donation
+from app.schemas.donation import DonationDB
+from app.services import constants as c
+from app.services.export import EXPORTERS
+from tests.benchmarks import common
+
+MODES = ('list', 'ndjson', 'csv')
+
+
+async def export_list(session) -> int:
+    donations = await donation_crud.get_multi(session)
+    body = json.dumps(jsonable_encoder(
+        [DonationDB.from_orm(donation) for donation in donations],
+        exclude={'close_date'}))
+    return len(body)
+
+
+async def export_stream(session, mode: str) -> int:
+    size = 0
+    async for chunk in EXPORTERS[mode](
+            session, Donation, c.DONATION_EXPORT_COLUMNS):
+        size += len(chunk)
+    return size
+
+
+async def worker(db_path: str, mode: str) -> None:
+    session_factory = common.async_sessionmaker(db_path)
+    started = time.perf_counter()
+    async with session_factory() as session:
+        if mode == 'list':
+            size = await export_list(session)
+        else:
+            size = await export_stream(session, mode)
+    elapsed = time.perf_counter() - started
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        'seconds': round(elapsed, 2),
+        'peak_rss_mb': round(peak_rss / 1024, 1),
+        'chars': size,
+    }))
+
+
+def main(donations: int) -> None:
+    db_path = common.temp_database()
+    common.create_schema(db_path)
+    common.seed_sources(db_path, Donation, closed=donations // 2,
+                        opened=donations - donations // 2)
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, '-m', 'tests.benchmarks.bench_export',
+             '--worker', mode, '--db', str(db_path)],
+            check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.splitlines()[-1])
+        print(
+            f'donations={donations:>8} {mode:>6}: '
+            f'peak RSS {result["peak_rss_mb"]:8.1f} MB, '
+            f'{result["seconds"]:7.2f} s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--donations', type=int, default=1_000_000)
+    parser.add_argument('--worker', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        common.run(lambda: worker(args.db, args.worker))
+    else:
+        main(args.donations)
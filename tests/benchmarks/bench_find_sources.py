@@ -0,0 +1,48 @@
+"""
+Замер выборки `open_sources_query` на таблице с большим числом закрытых записей.
+
+Сравнивается время выборки открытых пожертвований с частичным
+индексом `ix_donation_fully_invested_id` и без него.
+
+Запуск из корня проекта:
+
+    python -m tests.benchmarks.bench_find_sources --closed 1000000
+"""
+import argparse
+
+from sqlalchemy import text
+
+from app.models import Donation
+from app.services.find_sources import open_sources_query
+from tests.benchmarks import common
+
+
+async def main(closed: int, opened: int, repeat: int) -> None:
+    db_path = common.temp_database()
+    common.create_schema(db_path)
+    common.seed_sources(db_path, Donation, closed=closed, opened=opened)
+    session_factory = common.async_sessionmaker(db_path)
+
+    async def lookup():
+        async with session_factory() as session:
+            sources = (await session.execute(
+                open_sources_query(Donation).order_by(Donation.id)
+            )).scalars().all()
+            assert len(sources) == opened
+
+    print(f'closed={closed} open={opened}')
+    print('with index:   ', await common.measure(lookup, repeat))
+
+    async with session_factory() as session:
+        await session.execute(text('DROP INDEX ix_donation_fully_invested_id'))
+        await session.commit()
+    print('without index:', await common.measure(lookup, repeat))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--closed', type=int, default=1_000_000)
+    parser.add_argument('--open', type=int, default=1_000, dest='opened')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    common.run(lambda: main(args.closed, args.opened, args.repeat))
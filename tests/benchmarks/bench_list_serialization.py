@@ -0,0 +1,66 @@
+"""
+Скорость сериализации списка проектов (строк в секунду): прежний путь
+FastAPI через ORM-объекты, `orm_mode` и `jsonable_encoder` и быстрый
+путь `page_response` из выбранных колонок в `ORJSONResponse`.
+
+Запуск из корня проекта:
+
+    python -m tests.benchmarks.bench_list_serialization --rows 1000 10000
+"""
+import argparse
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.api.endpoints.charity_project import PROJECT_LIST_COLUMNS
+from app.crud.charity_project import charity_project_crud
+from app.models import CharityProject
+from app.schemas.charity_project import CharityProjectDB
+from tests.benchmarks import common
+
+RESPONSE_FIELD = create_response_field(
+    name='projects', type_=list[CharityProjectDB])
+
+
+async def orm_mode(session, rows: int) -> bytes:
+    projects = await charity_project_crud.get_multi(session, limit=rows)
+    content = await serialize_response(
+        field=RESPONSE_FIELD, response_content=projects,
+        exclude={'close_date'}, is_coroutine=True)
+    return JSONResponse(content).body
+
+
+async def columns(session, rows: int) -> bytes:
+    projects = await charity_project_crud.get_multi(
+        session, limit=rows, columns=PROJECT_LIST_COLUMNS)
+    return ORJSONResponse([row._asdict() for row in projects]).body
+
+
+async def main(sizes: list[int], repeat: int) -> None:
+    db_path = common.temp_database()
+    common.create_schema(db_path)
+    common.seed_sources(
+        db_path, CharityProject, closed=max(sizes) // 2,
+        opened=max(sizes) - max(sizes) // 2)
+    session_factory = common.async_sessionmaker(db_path)
+    for rows in sizes:
+        results = {}
+        for name, serialize in (('orm_mode', orm_mode), ('columns', columns)):
+            async def run_once():
+                async with session_factory() as session:
+                    await serialize(session, rows)
+            timing = await common.measure(run_once, repeat)
+            results[name] = rows / timing['median_ms'] * 1000
+        print(
+            f'rows={rows:>7}: orm_mode {results["orm_mode"]:10.0f} rows/s, '
+            f'columns {results["columns"]:10.0f} rows/s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--rows', type=int, nargs='+', default=[1_000, 10_000, 50_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    common.run(lambda: main(args.rows, args.repeat))
@@ -0,0 +1,99 @@
+"""
+Задержка `GET /charity_project/` во время волны входов в систему:
+p50 и p99 без нагрузки, с проверкой паролей прямо в цикле событий
+(как в `BaseUserManager`) и с проверкой в пуле `password_helper`.
+
+Запуск из корня проекта:
+
+    python -m tests.benchmarks.bench_login_storm --logins 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from httpx import AsyncClient
+from sqlalchemy import create_engine
+
+from app.core.db import get_async_session
+from app.core.user import password_helper
+from app.main import app
+from app.models import CharityProject, User
+from tests.benchmarks import common
+
+EMAIL = 'dead@pool.com'
+
+PASSWORD = 'chimichangas4life'
+
+
+def seed(db_path) -> None:
+    common.seed_sources(db_path, CharityProject, closed=50, opened=50)
+    engine = create_engine(f'sqlite:///{db_path}')
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), dict(
+            email=EMAIL, hashed_password=password_helper.hash(PASSWORD),
+            is_active=True, is_superuser=False, is_verified=True))
+    engine.dispose()
+
+
+async def probe(client, stop: asyncio.Event) -> list[float]:
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get('/charity_project/')
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+async def storm(client, logins: int) -> list[float]:
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe(client, stop))
+    if logins:
+        await asyncio.gather(*(
+            client.post('/auth/jwt/login', data={
+                'username': EMAIL, 'password': PASSWORD})
+            for _ in range(logins)))
+    else:
+        await asyncio.sleep(1)
+    stop.set()
+    return await prober
+
+
+def report(name: str, latencies: list[float]) -> None:
+    p99 = statistics.quantiles(latencies, n=100)[98]
+    print(
+        f'{name:>8}: p50 {statistics.median(latencies):8.1f} ms, '
+        f'p99 {p99:8.1f} ms, requests {len(latencies)}')
+
+
+async def main(logins: int) -> None:
+    db_path = common.temp_database()
+    common.create_schema(db_path)
+    seed(db_path)
+    session_factory = common.async_sessionmaker(db_path)
+
+    async def override_session():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_async_session] = override_session
+    pooled = password_helper.verify_and_update_async
+
+    async def inline(plain_password, hashed_password):
+        return password_helper.verify_and_update(
+            plain_password, hashed_password)
+
+    async with AsyncClient(app=app, base_url='http://test') as client:
+        report('idle', await storm(client, 0))
+        password_helper.verify_and_update_async = inline
+        report('inline', await storm(client, logins))
+        password_helper.verify_and_update_async = pooled
+        report('pooled', await storm(client, logins))
+    password_helper.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--logins', type=int, default=50)
+    args = parser.parse_args()
+    common.run(lambda: main(args.logins))
@@ -0,0 +1,81 @@
+"""
+Пропускная способность `POST /donation/` на SQLite в обычном режиме
+и с профилем производительности (`SQLITE_PERFORMANCE_MODE`).
+
+Каждый режим запускается в отдельном процессе со своей базой, потому
+что настройки движка читаются при импорте `app.core.db`. Запуск из
+корня проекта:
+
+    python -m tests.benchmarks.bench_sqlite_pragmas --donations 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from tests.benchmarks import common
+
+MODES = {
+    'default': 'false',
+    'performance': 'true',
+}
+
+
+async def worker(donations: int, concurrency: int) -> None:
+    from httpx import AsyncClient
+
+    from app.core.user import current_user
+    from app.main import app
+    from app.models import User
+
+    user = User(id=1, is_active=True, is_verified=True, is_superuser=False)
+    app.dependency_overrides[current_user] = lambda: user
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def post(client, number):
+        async with semaphore:
+            response = await client.post(
+                '/donation/', json={'full_amount': 100 + number})
+            assert response.status_code == 200, response.text
+
+    async with AsyncClient(app=app, base_url='http://test') as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            post(client, number) for number in range(donations)))
+        elapsed = time.perf_counter() - started
+    print(json.dumps({'seconds': elapsed}))
+
+
+def main(donations: int, concurrency: int) -> None:
+    for mode, enabled in MODES.items():
+        db_path = common.temp_database()
+        common.create_schema(db_path)
+        env = dict(
+            os.environ,
+            DATABASE_URL=f'sqlite+aiosqlite:///{db_path}',
+            SQLITE_PERFORMANCE_MODE=enabled)
+        output = subprocess.run(
+            [sys.executable, '-m', 'tests.benchmarks.bench_sqlite_pragmas',
+             '--worker', '--donations', str(donations),
+             '--concurrency', str(concurrency)],
+            env=env, check=True, capture_output=True, text=True).stdout
+        seconds = json.loads(output.splitlines()[-1])['seconds']
+        print(
+            f'{mode:>11}: {donations / seconds:8.1f} donations/s '
+            f'({seconds:.2f} s for {donations})')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--donations', type=int, default=2_000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--worker', action='store_true',
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        common.run(lambda: worker(args.donations, args.concurrency))
+    else:
+        main(args.donations, args.concurrency)
@@ -0,0 +1,61 @@
+"""
+Сравнение записи закрытых источников: `session.add_all` с ORM-объектами
+и пачечный `UPDATE ... WHERE id IN (...)` из `close_sources`.
+
+Запуск из корня проекта:
+
+    python -m tests.benchmarks.bench_write_back --sizes 1000 10000 100000
+"""
+import argparse
+import time
+
+from sqlalchemy import select
+
+from app.models import Donation
+from app.services.invest import source_set_fully_invested
+from app.services.write_back import close_sources
+from tests.benchmarks import common
+
+
+async def orm_flush(session_factory) -> float:
+    async with session_factory() as session:
+        sources = (await session.execute(select(Donation))).scalars().all()
+        for source in sources:
+            source_set_fully_invested(source)
+        started = time.perf_counter()
+        session.add_all(sources)
+        await session.flush()
+        elapsed = time.perf_counter() - started
+        await session.rollback()
+    return elapsed
+
+
+async def bulk_update(session_factory) -> float:
+    async with session_factory() as session:
+        ids = (await session.execute(select(Donation.id))).scalars().all()
+        started = time.perf_counter()
+        await close_sources(session, Donation, ids)
+        elapsed = time.perf_counter() - started
+        await session.rollback()
+    return elapsed
+
+
+async def main(sizes: list[int]) -> None:
+    for size in sizes:
+        db_path = common.temp_database()
+        common.create_schema(db_path)
+        common.seed_sources(db_path, Donation, closed=0, opened=size)
+        session_factory = common.async_sessionmaker(db_path)
+        orm = await orm_flush(session_factory)
+        bulk = await bulk_update(session_factory)
+        print(
+            f'sources={size:>7}: add_all flush {orm * 1000:9.1f} ms, '
+            f'bulk update {bulk * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+    common.run(lambda: main(args.sizes))
@@ -0,0 +1,96 @@
+"""Общие помощники для скриптов замеров производительности."""
+import asyncio
+import datetime
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db import Base
+from app.models import CharityProject, Donation
+
+SEED_CHUNK = 50_000
+
+
+def temp_database() -> Path:
+    """Возвращает путь к файлу свежей SQLite-базы во временном каталоге."""
+    return Path(tempfile.mkdtemp(prefix='qrkot-bench-')) / 'bench.db'
+
+
+def create_schema(db_path: Path) -> None:
+    """Создает все таблицы приложения в файле `db_path`."""
+    engine = create_engine(f'sqlite:///{db_path}')
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+
+def async_sessionmaker(db_path: Path) -> sessionmaker:
+    """Фабрика асинхронных сессий, настроенная как в `app.core.db`."""
+    engine = create_async_engine(f'sqlite+aiosqlite:///{db_path}')
+    return sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+
+def seed_sources(db_path: Path, model, closed: int, opened: int,
+                 amount: int = 100) -> None:
+    """
+    Заполняет таблицу `model` закрытыми, а затем открытыми записями.
+    """
+    engine = create_engine(f'sqlite:///{db_path}')
+    now = datetime.datetime.now()
+    extra = {}
+    if model is CharityProject:
+        extra = {'description': 'bench'}
+    table = model.__table__
+    with engine.begin() as conn:
+        start = conn.execute(
+            table.select().with_only_columns(table.c.id)
+            .order_by(table.c.id.desc()).limit(1)
+        ).scalar() or 0
+        rows = []
+        for number in range(start + 1, start + closed + opened + 1):
+            is_closed = number <= start + closed
+            row = dict(
+                id=number,
+                full_amount=amount,
+                invested_amount=amount if is_closed else 0,
+                fully_invested=is_closed,
+                create_date=now,
+                close_date=now if is_closed else None,
+                **extra
+            )
+            if model is CharityProject:
+                row['name'] = f'bench-{number}'
+            rows.append(row)
+            if len(rows) == SEED_CHUNK:
+                conn.execute(table.insert(), rows)
+                rows = []
+        if rows:
+            conn.execute(table.insert(), rows)
+    engine.dispose()
+
+
+async def measure(coro_factory, repeat: int) -> dict:
+    """
+    Выполняет `coro_factory()` `repeat` раз и возвращает медиану,
+    минимум и максимум времени выполнения в миллисекундах.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await coro_factory()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+def run(main) -> None:
+    """Запускает асинхронную функцию `main` скрипта замера."""
+    asyncio.run(main())
+
@@ -1,3 +1,18 @@
+import asyncio
+import time
+
+from conftest import app, get_async_session, override_db
+from httpx import AsyncClient
+
+from app.core.user import password_helper, token_cache, user_cache
+from app.services.constants import JWT_LIFETIME_SECONDS
+
+HEARTBEAT = 0.01
+
+LOGIN_STORM = 8
+
+MAX_LOOP_STALL = 0.15
+
 
 
 def test_register(test_client):
@@ -45,3 +60,97 @@ def test_register_invalid_pass(user_client):
         'При некорректной регистрации пользователя тело ответа API отличается '
         'от ожидаемого.'
     )
+
+
+def test_current_user_is_cached(test_client):
+    user_cache.clear()
+    test_client.post('/auth/register', json={
+        'email': 'dead@pool.com',
+        'password': 'chimichangas4life',
+    })
+    token = test_client.post('/auth/jwt/login', data={
+        'username': 'dead@pool.com',
+        'password': 'chimichangas4life',
+    }).json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    hits = user_cache.hits
+    for _ in range(3):
+        assert test_client.get('/users/me', headers=headers).status_code == 200
+    assert user_cache.hits - hits == 2, (
+        'Повторные запросы пользователя должны брать его из кэша.'
+    )
+    response = test_client.patch(
+        '/users/me', headers=headers, json={'email': 'wade@pool.com'}
+    )
+    assert response.status_code == 200, (
+        'Пользователь должен иметь возможность изменить свои данные.'
+    )
+    response = test_client.get('/users/me', headers=headers)
+    assert response.json()['email'] == 'wade@pool.com', (
+        'После изменения пользователя кэш должен быть сброшен.'
+    )
+
+
+def test_cached_token_expires(freezer, test_client):
+    freezer.move_to('2010-10-10')
+    user_cache.clear()
+    token_cache.clear()
+    test_client.post('/auth/register', json={
+        'email': 'dead@pool.com',
+        'password': 'chimichangas4life',
+    })
+    token = test_client.post('/auth/jwt/login', data={
+        'username': 'dead@pool.com',
+        'password': 'chimichangas4life',
+    }).json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    assert test_client.get('/users/me', headers=headers).status_code == 200
+    assert len(token_cache) == 1, (
+        'Проверенный токен должен сохраняться в кэше.'
+    )
+    freezer.tick(JWT_LIFETIME_SECONDS + 1)
+    response = test_client.get('/users/me', headers=headers)
+    assert response.status_code == 401, (
+        'Просроченный токен должен отклоняться, даже если он был в кэше.'
+    )
+
+
+async def test_login_storm_does_not_block_event_loop(mixer):
+    mixer.blend(
+        'app.models.user.User', email='dead@pool.com',
+        hashed_password=password_helper.hash('chimichangas4life'),
+        is_active=True, is_superuser=False, is_verified=True,
+    )
+    app.dependency_overrides = {get_async_session: override_db}
+    gaps = []
+
+    async def heartbeat(done):
+        previous = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(HEARTBEAT)
+            now = time.perf_counter()
+            gaps.append(now - previous)
+            previous = now
+
+    done = asyncio.Event()
+    ticker = asyncio.create_task(heartbeat(done))
+    try:
+        async with AsyncClient(app=app, base_url='http://test') as client:
+            responses = await asyncio.gather(*(
+                client.post('/auth/jwt/login', data={
+                    'username': 'dead@pool.com',
+                    'password': 'chimichangas4life',
+                })
+                for _ in range(LOGIN_STORM)
+            ))
+    finally:
+        done.set()
+        await ticker
+        app.dependency_overrides = {}
+    assert all(response.status_code == 200 for response in responses), (
+        'Все параллельные входы должны быть успешными.'
+    )
+    assert max(gaps) < MAX_LOOP_STALL, (
+        'Проверка паролей не должна блокировать цикл событий: '
+        f'самая долгая пауза {max(gaps):.3f} с.'
+    )
@@ -1,6 +1,13 @@
 from datetime import datetime
 
 import pytest
+from conftest import engine
+from sqlalchemy import event
+
+from app.api.endpoints import charity_project as project_endpoints
+from app.core.config import settings
+from app.services.open_pool import open_pools
+from app.services.response_cache import project_list_cache
 
 
 @pytest.mark.parametrize(
@@ -186,6 +193,55 @@ def test_get_all_charity_project(
     ], 'При запросе всех проектов тело ответа API отличается от ожидаемого.'
 
 
+def test_get_charity_projects_by_pages(
+    user_client, charity_project, charity_project_nunchaku
+):
+    response = user_client.get('/charity_project/?limit=1')
+    assert response.status_code == 200, (
+        'При запросе страницы проектов должен возвращаться статус-код 200.'
+    )
+    assert [project['id'] for project in response.json()] == [1], (
+        'Параметр `limit` должен ограничивать размер страницы.'
+    )
+    assert response.headers['X-Next-Cursor'] == '1', (
+        'Если есть следующая страница, в заголовке `X-Next-Cursor` должен '
+        'передаваться ID последней записи страницы.'
+    )
+    assert 'after=1' in response.headers['Link'], (
+        'В заголовке `Link` должна передаваться ссылка на следующую страницу.'
+    )
+    response = user_client.get('/charity_project/?limit=1&after=1')
+    assert [project['id'] for project in response.json()] == [2], (
+        'Параметр `after` должен возвращать записи после курсора.'
+    )
+    assert 'X-Next-Cursor' not in response.headers, (
+        'На последней странице курсор следующей страницы не передаётся.'
+    )
+
+
+@pytest.mark.parametrize('query, ids', [
+    ('fully_invested=true', [3]),
+    ('fully_invested=false', [1, 2]),
+    ('created_from=2010-10-10T00:00:01', []),
+])
+def test_filter_charity_projects(
+    user_client, charity_project, charity_project_nunchaku,
+    small_fully_charity_project, query, ids
+):
+    response = user_client.get(f'/charity_project/?{query}')
+    assert [project['id'] for project in response.json()] == ids, (
+        'Список проектов должен фильтроваться по `fully_invested` и дате '
+        'создания.'
+    )
+
+
+def test_get_charity_projects_limit_too_big(user_client):
+    response = user_client.get('/charity_project/?limit=100000')
+    assert response.status_code == 422, (
+        'Размер страницы больше допустимого должен быть запрещён.'
+    )
+
+
 def test_create_charity_project(superuser_client):
     response = superuser_client.post(
         '/charity_project/',
@@ -467,6 +523,19 @@ def test_update_charity_project_same_name(superuser_client, charity_project,
     }
 
 
+def test_update_charity_project_keep_own_name(superuser_client,
+                                              charity_project):
+    response = superuser_client.patch(
+        '/charity_project/1',
+        json={'name': 'chimichangas4life', 'full_amount': 2000000},
+    )
+    assert response.status_code == 200, (
+        'Передача текущего имени проекта при редактировании не должна '
+        'считаться нарушением уникальности.'
+    )
+    assert response.json()['full_amount'] == 2000000
+
+
 @pytest.mark.parametrize('full_amount', [
     0,
     5,
@@ -684,3 +753,137 @@ def test_get_all_charity_project_not_auth_user(test_client,
             'name': 'nunchaku'
         }
     ]
+
+
+@pytest.fixture
+def project_list_cache_enabled(monkeypatch):
+    monkeypatch.setattr(settings, 'response_cache_enabled', True)
+    monkeypatch.setattr(project_list_cache, '_backend', None)
+
+
+def test_project_list_etag(
+    user_client, charity_project, project_list_cache_enabled
+):
+    hits = project_list_cache.hits
+    response = user_client.get('/charity_project/')
+    etag = response.headers['ETag']
+    response = user_client.get(
+        '/charity_project/', headers={'If-None-Match': etag}
+    )
+    assert response.status_code == 304, (
+        'На запрос с совпавшим `If-None-Match` должен возвращаться '
+        'статус-код 304.'
+    )
+    assert project_list_cache.hits == hits + 1, (
+        'Повторный запрос списка проектов должен отдаваться из кэша.'
+    )
+    user_client.post('/donation/', json={'full_amount': 100})
+    response = user_client.get(
+        '/charity_project/', headers={'If-None-Match': etag}
+    )
+    assert response.status_code == 200, (
+        'После инвестирования в проект кэш списка проектов должен '
+        'сбрасываться.'
+    )
+    assert response.json()[0]['invested_amount'] == 100, (
+        'После сброса кэша список проектов должен отражать вложенные '
+        'средства.'
+    )
+
+
+def test_project_list_cache_invalidated_on_patch(
+    superuser_client, charity_project, project_list_cache_enabled
+):
+    superuser_client.get('/charity_project/')
+    superuser_client.patch('/charity_project/1', json={'name': 'tacos'})
+    response = superuser_client.get('/charity_project/')
+    assert response.json()[0]['name'] == 'tacos', (
+        'После изменения проекта кэш списка проектов должен сбрасываться.'
+    )
+
+
+def test_project_list_cache_skips_response_read_before_invalidation(
+    user_client, charity_project, project_list_cache_enabled, monkeypatch
+):
+    page_response = project_endpoints.page_response
+
+    async def page_response_then_invalidate(*args):
+        # Проект изменился, пока список читался из базы.
+        response = await page_response(*args)
+        await project_list_cache.invalidate()
+        return response
+
+    monkeypatch.setattr(
+        project_endpoints, 'page_response', page_response_then_invalidate)
+    user_client.get('/charity_project/')
+    monkeypatch.setattr(project_endpoints, 'page_response', page_response)
+    hits = project_list_cache.hits
+    user_client.get('/charity_project/')
+    assert project_list_cache.hits == hits, (
+        'Ответ, прочитанный до сброса кэша, не должен выдаваться '
+        'после сброса.'
+    )
+
+
+@pytest.fixture
+def project_statements():
+    statements = []
+
+    def on_execute(conn, cursor, statement, *args):
+        if statement.endswith('WHERE 0 = 1'):
+            # Блокировка `lock_allocation` на SQLite.
+            statements.append('LOCK')
+        elif 'charityproject' in statement:
+            statements.append(statement.split()[0])
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', on_execute)
+    yield statements
+    event.remove(engine.sync_engine, 'before_cursor_execute', on_execute)
+
+
+def test_update_and_delete_without_extra_lookups(
+    superuser_client, charity_project, charity_project_nunchaku,
+    project_statements
+):
+    superuser_client.patch(
+        '/charity_project/1', json={'description': 'Give me the money!'})
+    assert project_statements == ['LOCK', 'UPDATE', 'SELECT'], (
+        'Редактирование проекта должно выполняться одним запросом '
+        '`UPDATE` с проверками в `WHERE`, без предварительного чтения, '
+        'после блокировки распределения.'
+    )
+    project_statements.clear()
+    response = superuser_client.delete('/charity_project/2')
+    assert response.status_code == 200
+    assert project_statements == ['LOCK', 'SELECT', 'DELETE'], (
+        'Удаление проекта не должно перечитывать проект повторно '
+        'и должно начинаться с блокировки распределения.'
+    )
+    project_statements.clear()
+    response = superuser_client.delete('/charity_project/2')
+    assert response.status_code == 404, (
+        'Повторное удаление проекта должно возвращать статус-код 404.'
+    )
+
+
+def test_update_and_delete_keep_open_pool_in_sync(
+    superuser_client, charity_project, charity_project_nunchaku, monkeypatch
+):
+    monkeypatch.setattr(settings, 'open_pool_index_enabled', True)
+    open_pools.invalidate()
+    try:
+        superuser_client.post('/maintenance/open_pool/rebuild')
+        superuser_client.patch('/charity_project/1', json={'full_amount': 10})
+        superuser_client.delete('/charity_project/2')
+        report = superuser_client.get('/maintenance/open_pool').json()
+    finally:
+        open_pools.invalidate()
+    assert report['charityproject']['ready'], (
+        'Редактирование и удаление проекта не должны сбрасывать индекс '
+        'открытых проектов.'
+    )
+    assert report['charityproject']['size'] == 1
+    for table, result in report.items():
+        assert not (
+            result['missing'] or result['unexpected'] or result['mismatched']
+        ), f'Индекс открытых записей `{table}` разошёлся с базой: {result}.'
@@ -0,0 +1,264 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from conftest import (
+    TEST_DB, app, current_superuser, current_user, engine, get_async_session,
+    override_db
+)
+from fixtures.user import superuser, user
+from httpx import AsyncClient
+from sqlalchemy import create_engine, delete, event, func, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models import CharityProject, Donation, FundSummary
+from app.services.allocation import allocation_queue
+from app.services.invest import lock_allocation
+from app.services.open_pool import open_pools
+from app.services.write_back import add_invested_amount, close_sources
+
+DONATIONS_COUNT = 500
+
+BACKGROUND_DONATIONS_COUNT = 50
+
+
+def donation_amount(number):
+    return 1000 + number * 7919 % 20000
+
+
+def check_invariants(model, rows):
+    for full_amount, invested_amount, fully_invested in rows:
+        assert invested_amount <= full_amount, (
+            f'В `{model.__name__}` вложено больше целевой суммы.'
+        )
+        assert fully_invested == (invested_amount == full_amount), (
+            f'Статус `fully_invested` в `{model.__name__}` не соответствует '
+            'вложенной сумме.'
+        )
+
+
+def create_projects(mixer, *amounts):
+    for number, full_amount in enumerate(amounts):
+        mixer.blend(
+            'app.models.charity_project.CharityProject',
+            name=f'project {number}', description='project',
+            full_amount=full_amount, invested_amount=0,
+            fully_invested=False, close_date=None,
+        )
+
+
+async def post_donations(count, wait_for_queue=False):
+    app.dependency_overrides = {
+        get_async_session: override_db,
+        current_user: lambda: user,
+    }
+    try:
+        async with AsyncClient(app=app, base_url='http://test') as client:
+            responses = await asyncio.gather(*(
+                client.post(
+                    '/donation/', json={'full_amount': donation_amount(number)}
+                )
+                for number in range(count)
+            ))
+        if wait_for_queue:
+            await allocation_queue.join()
+    finally:
+        await allocation_queue.stop()
+        app.dependency_overrides = {}
+    return responses
+
+
+async def test_concurrent_donations_keep_sums(mixer):
+    create_projects(mixer, 1000000, 5000000)
+    responses = await post_donations(DONATIONS_COUNT)
+    assert all(response.status_code == 200 for response in responses), (
+        'Все параллельные пожертвования должны быть созданы.'
+    )
+
+    engine = create_engine(f'sqlite:///{TEST_DB}')
+    with engine.connect() as conn:
+        totals = {}
+        for model in (CharityProject, Donation):
+            rows = conn.execute(select(
+                model.full_amount, model.invested_amount,
+                model.fully_invested,
+            )).all()
+            check_invariants(model, rows)
+            totals[model] = sum(row.invested_amount for row in rows)
+        open_projects = conn.execute(select(func.count()).where(
+            CharityProject.fully_invested.is_(False))).scalar()
+        open_donations = conn.execute(select(func.count()).where(
+            Donation.fully_invested.is_(False))).scalar()
+        summary = conn.execute(select(
+            FundSummary.project_invested_amount,
+            FundSummary.donation_invested_amount,
+            FundSummary.donation_count,
+        )).one()
+    engine.dispose()
+
+    assert totals[CharityProject] == totals[Donation], (
+        'Сумма, вложенная в проекты, должна совпадать с суммой, '
+        'распределённой из пожертвований.'
+    )
+    assert totals[Donation] == sum(
+        donation_amount(number) for number in range(DONATIONS_COUNT)
+    ), 'Все пожертвования должны быть распределены по открытым проектам.'
+    assert not (open_projects and open_donations), (
+        'Открытые проекты и нераспределённые пожертвования не должны '
+        'существовать одновременно.'
+    )
+    assert summary == (
+        totals[CharityProject], totals[Donation], DONATIONS_COUNT
+    ), 'Сводка фонда должна совпадать с суммами по исходным таблицам.'
+
+
+async def test_background_allocator_batches_donations(monkeypatch, mixer):
+    create_projects(mixer, 1000000)
+    monkeypatch.setattr(settings, 'allocation_background', True)
+    monkeypatch.setattr(allocation_queue, 'window', 0.5)
+    commits = []
+
+    def on_commit(conn):
+        commits.append(conn)
+
+    event.listen(engine.sync_engine, 'commit', on_commit)
+    try:
+        responses = await post_donations(
+            BACKGROUND_DONATIONS_COUNT, wait_for_queue=True
+        )
+    finally:
+        event.remove(engine.sync_engine, 'commit', on_commit)
+    assert all(response.status_code == 200 for response in responses), (
+        'Все пожертвования должны быть созданы.'
+    )
+    allocation_commits = len(commits) - BACKGROUND_DONATIONS_COUNT
+    assert 0 < allocation_commits < BACKGROUND_DONATIONS_COUNT // 5, (
+        'Фоновое распределение должно объединять пожертвования в пачки.'
+    )
+
+    sync_engine = create_engine(f'sqlite:///{TEST_DB}')
+    with sync_engine.connect() as conn:
+        invested = conn.execute(select(CharityProject.invested_amount)).scalar()
+        open_donations = conn.execute(select(func.count()).where(
+            Donation.fully_invested.is_(False))).scalar()
+    sync_engine.dispose()
+    assert invested == sum(
+        donation_amount(number)
+        for number in range(BACKGROUND_DONATIONS_COUNT)
+    ), 'Фоновое распределение должно вложить все пожертвования в проект.'
+    assert open_donations == 0, (
+        'После фонового распределения не должно остаться открытых '
+        'пожертвований.'
+    )
+
+
+async def test_open_pool_index_stays_in_sync(monkeypatch, mixer):
+    create_projects(mixer, 100000, 200000, 5000000)
+    monkeypatch.setattr(settings, 'open_pool_index_enabled', True)
+    open_pools.invalidate()
+    try:
+        responses = await post_donations(BACKGROUND_DONATIONS_COUNT)
+        async with AsyncSession(engine) as session:
+            report = await open_pools.check(session)
+    finally:
+        open_pools.invalidate()
+    assert all(response.status_code == 200 for response in responses), (
+        'Все пожертвования должны быть созданы.'
+    )
+    for table, result in report.items():
+        assert not (
+            result['missing'] or result['unexpected'] or result['mismatched']
+        ), f'Индекс открытых записей `{table}` разошёлся с базой: {result}.'
+    assert report['charityproject']['size'] == 1, (
+        'Первые два проекта должны быть закрыты пожертвованиями.'
+    )
+
+    sync_engine = create_engine(f'sqlite:///{TEST_DB}')
+    with sync_engine.connect() as conn:
+        invested = conn.execute(
+            select(func.sum(CharityProject.invested_amount))).scalar()
+    sync_engine.dispose()
+    assert invested == sum(
+        donation_amount(number)
+        for number in range(BACKGROUND_DONATIONS_COUNT)
+    ), 'С индексом все пожертвования должны быть вложены в проекты.'
+
+
+async def test_concurrent_projects_with_same_name():
+    app.dependency_overrides = {
+        get_async_session: override_db,
+        current_superuser: lambda: superuser,
+    }
+    try:
+        async with AsyncClient(app=app, base_url='http://test') as client:
+            responses = await asyncio.gather(*(
+                client.post('/charity_project/', json={
+                    'name': 'twins', 'description': 'twins',
+                    'full_amount': 1000,
+                })
+                for _ in range(5)
+            ))
+    finally:
+        await allocation_queue.stop()
+        app.dependency_overrides = {}
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses == [200, 400, 400, 400, 400], (
+        'Из параллельных запросов на создание проектов с одним именем '
+        'должен выполниться только один, остальные получают статус-код 400.'
+    )
+    assert all(
+        response.json() == {'detail': 'Проект с таким именем уже существует!'}
+        for response in responses if response.status_code == 400
+    )
+
+
+class RecordingSession:
+    """Сессия-заглушка, которая только запоминает SQL запросов."""
+
+    def __init__(self, dialect):
+        self.bind = SimpleNamespace(dialect=dialect)
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(
+            str(statement.compile(dialect=self.bind.dialect)))
+
+
+async def test_allocation_lock_on_postgresql():
+    session = RecordingSession(postgresql.dialect())
+    await lock_allocation(session)
+    assert len(session.statements) == 1 and (
+        'pg_advisory_xact_lock' in session.statements[0]
+    ), (
+        'На PostgreSQL распределение должно сериализоваться '
+        'advisory-блокировкой, чтобы новый проект и новое пожертвование '
+        'видели записи друг друга.'
+    )
+
+
+async def test_allocation_lock_on_sqlite_blocks_writers(mixer):
+    create_projects(mixer, 1000)
+    sync_engine = create_engine(
+        f'sqlite:///{TEST_DB}', connect_args={'timeout': 0})
+    async with AsyncSession(engine) as session:
+        await lock_allocation(session)
+        try:
+            with pytest.raises(OperationalError), sync_engine.begin() as conn:
+                conn.execute(delete(CharityProject))
+        finally:
+            sync_engine.dispose()
+            await session.rollback()
+
+
+async def test_write_back_skips_closed_sources(mixer):
+    create_projects(mixer, 1000, 2000)
+    async with AsyncSession(engine) as session:
+        await close_sources(session, CharityProject, [1])
+        with pytest.raises(RuntimeError):
+            await close_sources(session, CharityProject, [1, 2])
+        with pytest.raises(RuntimeError):
+            await add_invested_amount(session, CharityProject, 1, 100)
+        await session.rollback()
@@ -1,6 +1,13 @@
+import csv
+import io
+import json
 from datetime import datetime
 
 import pytest
+from conftest import engine
+from sqlalchemy import event
+
+from app.core.config import settings
 
 
 @pytest.mark.parametrize('json, keys, expected_data', [
@@ -83,6 +90,24 @@ def test_get_user_donation(user_client, donation):
     )
 
 
+def test_get_user_donations_by_pages(user_client, donation, another_donation):
+    for full_amount in (10, 20):
+        user_client.post('/donation/', json={'full_amount': full_amount})
+    response = user_client.get('/donation/my?limit=2')
+    assert [item['id'] for item in response.json()] == [1, 3], (
+        'Страница пожертвований пользователя должна содержать только его '
+        'пожертвования в порядке ID.'
+    )
+    assert response.headers['X-Next-Cursor'] == '3', (
+        'Если у пользователя есть ещё пожертвования, в заголовке '
+        '`X-Next-Cursor` должен передаваться курсор следующей страницы.'
+    )
+    response = user_client.get('/donation/my?limit=2&after=3')
+    assert [item['id'] for item in response.json()] == [4], (
+        'Параметр `after` должен возвращать пожертвования после курсора.'
+    )
+
+
 def test_get_all_donations(superuser_client, donation, another_donation):
     response = superuser_client.get('/donation/')
     assert response.status_code == 200, (
@@ -197,3 +222,184 @@ def test_create_donation_check_create_date(user_client):
         'При создании двух пожертвований с паузой (в 1 секунду, например) у '
         'них должны быть разные `create_date`'
     )
+
+
+def test_create_donation_single_commit(user_client, charity_project):
+    commits = []
+
+    def on_commit(conn):
+        commits.append(conn)
+
+    event.listen(engine.sync_engine, 'commit', on_commit)
+    try:
+        response = user_client.post('/donation/', json={'full_amount': 10})
+    finally:
+        event.remove(engine.sync_engine, 'commit', on_commit)
+    assert response.status_code == 200, (
+        'При создании пожертвования должен возвращаться статус-код 200.'
+    )
+    assert len(commits) == 1, (
+        'Создание пожертвования и распределение средств должны '
+        'фиксироваться одной транзакцией.'
+    )
+
+
+def test_export_donations_ndjson(superuser_client, donation, another_donation):
+    response = superuser_client.get('/donation/export')
+    assert response.status_code == 200, (
+        'При выгрузке пожертвований должен возвращаться статус-код 200.'
+    )
+    assert response.headers['content-type'].startswith(
+        'application/x-ndjson'
+    ), 'По умолчанию пожертвования должны выгружаться в NDJSON.'
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows == [
+        {
+            'id': 1,
+            'full_amount': 100,
+            'comment': 'To you for chimichangas',
+            'user_id': 2,
+            'invested_amount': 0,
+            'fully_invested': False,
+            'create_date': '2011-11-11T00:00:00',
+            'close_date': None,
+        },
+        {
+            'id': 2,
+            'full_amount': 2000,
+            'comment': 'From admin',
+            'user_id': 1,
+            'invested_amount': 0,
+            'fully_invested': False,
+            'create_date': '2012-12-12T00:00:00',
+            'close_date': None,
+        },
+    ], 'Выгрузка в NDJSON отличается от ожидаемой.'
+
+
+def test_export_donations_csv(superuser_client, donation, another_donation):
+    response = superuser_client.get('/donation/export?format=csv')
+    assert response.status_code == 200, (
+        'При выгрузке пожертвований должен возвращаться статус-код 200.'
+    )
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == [
+        'id', 'full_amount', 'comment', 'user_id', 'invested_amount',
+        'fully_invested', 'create_date', 'close_date',
+    ], 'Первая строка CSV должна содержать названия колонок.'
+    assert [row[0] for row in rows[1:]] == ['1', '2'], (
+        'В CSV должны быть выгружены все пожертвования в порядке ID.'
+    )
+
+
+def test_export_donations_usual_user(user_client, donation):
+    response = user_client.get('/donation/export')
+    assert response.status_code in (401, 403), (
+        'Выгружать пожертвования может только суперпользователь.'
+    )
+
+
+@pytest.mark.parametrize('engine', ['stream', 'prefix_sum'])
+def test_create_donations_bulk(superuser_client, mixer, monkeypatch, engine):
+    monkeypatch.setattr(settings, 'investment_engine', engine)
+    partner = mixer.blend('app.models.user.User')
+    superuser_client.post('/charity_project/', json={
+        'name': 'Котам на корм',
+        'description': 'Корм для кошек',
+        'full_amount': 1000,
+    })
+    response = superuser_client.post('/donation/bulk', json=[
+        {'full_amount': 600, 'user_id': partner.id},
+        {'full_amount': 600, 'user_id': partner.id + 100},
+        {'full_amount': -5},
+        {'full_amount': 600, 'comment': 'Партнёр', 'user_id': partner.id},
+        'not a donation',
+        {'full_amount': 600},
+    ])
+    assert response.status_code == 200, (
+        'При пакетной загрузке пожертвований должен возвращаться '
+        'статус-код 200.'
+    )
+    results = response.json()
+    assert [result['line'] for result in results] == [1, 2, 3, 4, 5, 6], (
+        'Результаты пакетной загрузки должны идти по порядку строк.'
+    )
+    assert results[0] == {
+        'line': 1, 'id': 1, 'invested_amount': 600, 'fully_invested': True,
+    }, 'Пожертвования пакета должны сразу распределяться по проектам.'
+    assert results[3] == {
+        'line': 4, 'id': 2, 'invested_amount': 400, 'fully_invested': False,
+    }, 'Остаток пакета должен ждать открытия новых проектов.'
+    assert results[1] == {
+        'line': 2, 'error': 'Пользователь не найден',
+    }, 'Строка с неизвестным пользователем должна пропускаться.'
+    assert 'full_amount' in results[2]['error'], (
+        'Строка, не прошедшая проверку, должна пропускаться с ошибкой.'
+    )
+    assert 'error' in results[4]
+    assert 'user_id' in results[5]['error'], (
+        'Строка без пользователя должна пропускаться с ошибкой.'
+    )
+
+    donations = superuser_client.get('/donation/').json()
+    assert [donation['user_id'] for donation in donations] == [
+        partner.id, partner.id
+    ], 'Пакет должен сохранять пользователей пожертвований.'
+    project = superuser_client.get('/charity_project/').json()[0]
+    assert project['fully_invested'], (
+        'Пакет пожертвований должен закрывать открытые проекты.'
+    )
+    stats = superuser_client.get('/stats/').json()
+    assert (stats['donations'], stats['total_raised'],
+            stats['unallocated_donations']) == (2, 1200, 200), (
+        'Сводка фонда должна учитывать пакетную загрузку.'
+    )
+
+
+def test_create_donations_bulk_ndjson(
+        superuser_client, charity_project, mixer):
+    partner = mixer.blend('app.models.user.User')
+    body = '\n'.join([
+        json.dumps({'full_amount': 100, 'user_id': partner.id}),
+        '',
+        '{"full_amount": ',
+        json.dumps({
+            'full_amount': 200, 'comment': 'Партнёр', 'user_id': partner.id,
+        }),
+    ])
+    response = superuser_client.post(
+        '/donation/bulk', data=body.encode(),
+        headers={'Content-Type': 'application/x-ndjson'})
+    assert response.status_code == 200
+    assert response.json() == [
+        {'line': 1, 'id': 1, 'invested_amount': 100, 'fully_invested': True},
+        {'line': 3, 'error': 'Строка не является JSON-объектом'},
+        {'line': 4, 'id': 2, 'invested_amount': 200, 'fully_invested': True},
+    ], 'Строки NDJSON должны загружаться по отдельности.'
+
+
+@pytest.mark.parametrize('body', [b'{"full_amount": 100}', b'[{'])
+def test_create_donations_bulk_invalid_body(superuser_client, body):
+    response = superuser_client.post(
+        '/donation/bulk', data=body,
+        headers={'Content-Type': 'application/json'})
+    assert response.status_code == 422, (
+        'Тело пакетной загрузки должно быть JSON-массивом или NDJSON.'
+    )
+
+
+def test_create_donations_bulk_too_many(superuser_client, monkeypatch):
+    monkeypatch.setattr(settings, 'bulk_donations_max', 2)
+    response = superuser_client.post(
+        '/donation/bulk', json=[{'full_amount': 100}] * 3)
+    assert response.status_code == 422, (
+        'Пакет больше `bulk_donations_max` строк должен отклоняться.'
+    )
+
+
+def test_create_donations_bulk_usual_user(user_client):
+    response = user_client.post(
+        '/donation/bulk', json=[{'full_amount': 100}])
+    assert response.status_code == 401, (
+        'Загружать пакеты пожертвований может только суперпользователь.'
+    )
@@ -1,3 +1,14 @@
+import pytest
+from conftest import engine as db_engine
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models import CharityProject, Donation
+from app.services import allocation
+from app.services.open_pool import open_pools
+
+
 def test_donation_exist_non_project(superuser_client, donation):
     response_donation = superuser_client.get('/donation/')
     data_donation = response_donation.json()
@@ -55,3 +66,175 @@ def test_donation_to_little_invest_project(
     )
     assert not charity_project_nunchaku.fully_invested, common_asser_msg
     assert charity_project_nunchaku.invested_amount == 0, common_asser_msg
+
+
+def test_donation_spread_over_two_projects(user_client, charity_project,
+                                           charity_project_nunchaku):
+    common_asser_msg = (
+        'Создано 2 пустых проекта. Тест создает пожертвование больше цели '
+        'первого проекта. Первый проект должен закрыться, остаток '
+        'пожертвования должен уйти во второй проект.'
+    )
+    user_client.post('/donation/', json={
+        'full_amount': 1500000,
+    })
+    assert charity_project.fully_invested, common_asser_msg
+    assert not charity_project_nunchaku.fully_invested, common_asser_msg
+    assert charity_project_nunchaku.invested_amount == 500000, (
+        common_asser_msg
+    )
+
+
+def test_donation_bigger_than_open_projects(user_client,
+                                            charity_project_little_invested):
+    user_client.post('/donation/', json={
+        'full_amount': 2000000,
+    })
+    assert charity_project_little_invested.fully_invested, (
+        'Если пожертвование больше потребности открытого проекта, '
+        'проект должен быть закрыт.'
+    )
+    assert charity_project_little_invested.invested_amount == 1000000, (
+        'Если пожертвование больше потребности открытого проекта, '
+        'в проект должна быть вложена только недостающая сумма.'
+    )
+
+
+@pytest.mark.parametrize('engine', ['stream', 'prefix_sum'])
+def test_investment_engines_agree(monkeypatch, user_client, charity_project,
+                                  charity_project_nunchaku, engine):
+    monkeypatch.setattr(settings, 'investment_engine', engine)
+    common_asser_msg = (
+        f'Движок `{engine}`: пожертвования должны закрывать проекты '
+        'по порядку, остаток уходит в следующий проект.'
+    )
+    for amount in (400000, 700000, 100000):
+        user_client.post('/donation/', json={'full_amount': amount})
+    assert charity_project.fully_invested, common_asser_msg
+    assert charity_project.invested_amount == 1000000, common_asser_msg
+    assert not charity_project_nunchaku.fully_invested, common_asser_msg
+    assert charity_project_nunchaku.invested_amount == 200000, (
+        common_asser_msg
+    )
+
+
+def test_new_project_takes_open_donations(superuser_client, donation,
+                                          another_donation):
+    response = superuser_client.post('/charity_project/', json={
+        'name': 'Котам на корм',
+        'description': 'Корм для кошек',
+        'full_amount': 1000,
+    })
+    assert response.json()['invested_amount'] == 1000, (
+        'Новый проект должен сразу получить средства из открытых '
+        'пожертвований.'
+    )
+    data = superuser_client.get('/donation/').json()
+    assert data[0]['fully_invested'], (
+        'Распределение средств при создании проекта должно сохраняться '
+        'в базе данных.'
+    )
+    assert data[1]['invested_amount'] == 900, (
+        'Распределение средств при создании проекта должно сохраняться '
+        'в базе данных.'
+    )
+
+
+@pytest.mark.parametrize('engine', ['stream', 'prefix_sum'])
+def test_raised_full_amount_takes_open_donations(
+        monkeypatch, superuser_client, charity_project,
+        charity_project_nunchaku, donation, another_donation, engine):
+    # Пожертвования из фикстур ещё не распределены, как после фонового
+    # создания до прихода очереди распределения.
+    monkeypatch.setattr(settings, 'investment_engine', engine)
+    response = superuser_client.patch(
+        '/charity_project/1', json={'full_amount': 1500})
+    assert response.status_code == 200
+    assert response.json()['invested_amount'] == 1500, (
+        f'Движок `{engine}`: после изменения целевой суммы в проект '
+        'должны сразу вкладываться открытые пожертвования.'
+    )
+    assert response.json()['fully_invested'], (
+        'Проект, получивший новую целевую сумму целиком, должен закрываться.'
+    )
+    response = superuser_client.patch(
+        '/charity_project/2', json={'full_amount': 5000})
+    assert response.json()['invested_amount'] == 600, (
+        'В проект должен уйти только свободный остаток пожертвований.'
+    )
+    assert not response.json()['fully_invested']
+    donations = superuser_client.get('/donation/').json()
+    assert all(donation['fully_invested'] for donation in donations), (
+        'Пожертвования, вложенные после изменения целевой суммы '
+        'проекта, должны закрываться.'
+    )
+    stats = superuser_client.get('/stats/').json()
+    assert stats['total_invested'] == 2100, (
+        'Сводка фонда должна учитывать средства, вложенные после '
+        'изменения целевой суммы проекта.'
+    )
+    assert stats['open_project_demand'] == 4400
+
+
+@pytest.mark.parametrize('engine', ['stream', 'prefix_sum'])
+def test_open_pool_index_misses_other_workers(
+        monkeypatch, superuser_client, mixer, engine):
+    monkeypatch.setattr(settings, 'investment_engine', engine)
+    monkeypatch.setattr(settings, 'open_pool_index_enabled', True)
+    open_pools.invalidate()
+    try:
+        superuser_client.post('/maintenance/open_pool/rebuild')
+        # Пожертвование другого процесса: индекс этого процесса о нём
+        # не знает.
+        monkeypatch.setattr(settings, 'open_pool_index_enabled', False)
+        mixer.blend(
+            'app.models.donation.Donation', full_amount=700,
+            invested_amount=0, fully_invested=False, close_date=None)
+        monkeypatch.setattr(settings, 'open_pool_index_enabled', True)
+        response = superuser_client.post('/charity_project/', json={
+            'name': 'Котам на корм',
+            'description': 'Корм для кошек',
+            'full_amount': 1000,
+        })
+    finally:
+        open_pools.invalidate()
+    assert response.json()['invested_amount'] == 700, (
+        f'Движок `{engine}`: если по индексу открытых пожертвований '
+        'не хватает, нужно читать и пожертвования, которых индекс не знает.'
+    )
+
+
+@pytest.mark.parametrize('engine', ['stream', 'prefix_sum'])
+async def test_allocate_donations_uses_configured_engine(
+        monkeypatch, mixer, engine):
+    monkeypatch.setattr(settings, 'investment_engine', engine)
+    batch_engine = allocation.BATCH_ENGINES[engine]
+    calls = []
+
+    async def spy(*args):
+        calls.append(engine)
+        await batch_engine(*args)
+
+    monkeypatch.setitem(allocation.BATCH_ENGINES, engine, spy)
+    mixer.blend(
+        'app.models.charity_project.CharityProject', full_amount=1000,
+        invested_amount=0, fully_invested=False, close_date=None)
+    for _ in range(2):
+        mixer.blend(
+            'app.models.donation.Donation', full_amount=600,
+            invested_amount=0, fully_invested=False, close_date=None)
+    async with AsyncSession(db_engine) as session:
+        await allocation.allocate_donations(session)
+        await session.commit()
+        project = (await session.execute(
+            select(CharityProject.invested_amount))).scalar()
+        donations = (await session.execute(
+            select(Donation.invested_amount).order_by(Donation.id)
+        )).scalars().all()
+    assert calls == [engine], (
+        f'Фоновое распределение должно идти движком `{engine}` '
+        'из настройки `investment_engine`.'
+    )
+    assert (project, donations) == (1000, [600, 400]), (
+        f'Движок `{engine}`: пожертвования должны вкладываться по порядку.'
+    )
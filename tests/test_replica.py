@@ -0,0 +1,81 @@
+import sqlite3
+
+import pytest
+from conftest import TEST_DB
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core import db
+from app.core.config import settings
+from app.services import constants as c
+
+
+def replicate(replica_path):
+    """Заменитель репликации: копирует основную базу в файл реплики."""
+    source = sqlite3.connect(TEST_DB)
+    replica = sqlite3.connect(replica_path)
+    source.backup(replica)
+    replica.close()
+    source.close()
+
+
+@pytest.fixture
+def replica(monkeypatch, tmp_path, donation):
+    replica_path = tmp_path / 'replica.db'
+    replicate(replica_path)
+    replica_engine = create_async_engine(
+        f'sqlite+aiosqlite:///{replica_path}'
+    )
+    monkeypatch.setattr(db, 'ReplicaSessionLocal', sessionmaker(
+        replica_engine, expire_on_commit=False, class_=AsyncSession,
+    ))
+    monkeypatch.setattr(settings, 'replica_staleness_seconds', 60)
+    return replica_path
+
+
+def test_reads_go_to_replica(user_client, replica, mixer):
+    mixer.blend(
+        'app.models.donation.Donation', user_id=2, full_amount=500,
+    )
+    response = user_client.get('/donation/my')
+    assert [item['id'] for item in response.json()] == [1], (
+        'Без недавних записей список пожертвований должен читаться '
+        'с реплики.'
+    )
+    replicate(replica)
+    response = user_client.get('/donation/my')
+    assert [item['id'] for item in response.json()] == [1, 2], (
+        'После репликации изменения должны быть видны при чтении с реплики.'
+    )
+
+
+def test_reads_after_write_go_to_primary(user_client, replica):
+    response = user_client.post('/donation/', json={'full_amount': 10})
+    assert c.LAST_WRITE_COOKIE in response.cookies, (
+        'После записи клиент должен получать cookie со временем записи.'
+    )
+    response = user_client.get('/donation/my')
+    assert [item['id'] for item in response.json()] == [1, 2], (
+        'В течение `replica_staleness_seconds` после записи чтение должно '
+        'идти с основной базы.'
+    )
+    user_client.cookies.clear()
+    response = user_client.get('/donation/my')
+    assert [item['id'] for item in response.json()] == [1], (
+        'Запись одного клиента не должна переводить чтения остальных '
+        'клиентов на основную базу.'
+    )
+
+
+def test_reads_without_write_keep_replica(user_client, replica):
+    response = user_client.get('/donation/my')
+    assert c.LAST_WRITE_COOKIE not in response.cookies, (
+        'Чтение не должно выдавать cookie записи.'
+    )
+
+
+def test_no_write_cookie_without_replica(user_client):
+    response = user_client.post('/donation/', json={'full_amount': 10})
+    assert c.LAST_WRITE_COOKIE not in response.cookies, (
+        'Без реплики cookie записи не нужна.'
+    )
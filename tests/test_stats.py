@@ -0,0 +1,55 @@
+def test_stats_empty(test_client):
+    response = test_client.get('/stats/')
+    assert response.status_code == 200, (
+        'GET-запрос к `/stats/` должен быть доступен всем.'
+    )
+    assert response.json() == {
+        'projects': 0,
+        'donations': 0,
+        'total_raised': 0,
+        'total_invested': 0,
+        'open_project_demand': 0,
+        'unallocated_donations': 0,
+    }, 'Для пустой базы все показатели сводки должны быть нулевыми.'
+
+
+def test_stats_follow_investment(superuser_client, donation,
+                                 another_donation):
+    superuser_client.post('/charity_project/', json={
+        'name': 'first', 'description': 'first', 'full_amount': 1000,
+    })
+    response = superuser_client.post('/charity_project/', json={
+        'name': 'second', 'description': 'second', 'full_amount': 1500,
+    })
+    superuser_client.patch(
+        f'/charity_project/{response.json()["id"]}',
+        json={'full_amount': 1200})
+    response = superuser_client.post('/charity_project/', json={
+        'name': 'third', 'description': 'third', 'full_amount': 50,
+    })
+    superuser_client.delete(f'/charity_project/{response.json()["id"]}')
+    expected = {
+        'projects': 2,
+        'donations': 2,
+        'total_raised': 2100,
+        'total_invested': 2100,
+        'open_project_demand': 100,
+        'unallocated_donations': 0,
+    }
+    assert superuser_client.get('/stats/').json() == expected, (
+        'Сводка должна учитывать создание, изменение и удаление проектов, '
+        'а также распределение пожертвований.'
+    )
+    response = superuser_client.post('/maintenance/summary/rebuild')
+    assert response.status_code == 200
+    assert response.json()['before'] == response.json()['after'], (
+        'Пересчёт сводки по исходным таблицам не должен менять её значения.'
+    )
+    assert superuser_client.get('/stats/').json() == expected
+
+
+def test_summary_rebuild_only_for_superuser(user_client):
+    response = user_client.post('/maintenance/summary/rebuild')
+    assert response.status_code == 401, (
+        'Пересчёт сводки должен быть доступен только суперпользователю.'
+    )